@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+CryptoBud Recommendation Backtester
+Replays the recommendation rules over sliding windows of price history and scores the signals
+"""
+
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from crypto_analyzer import CryptoAnalyzer, RECOMMENDATION_LABELS, RECOMMENDATION_THRESHOLDS, score_market_arrays
+from market_store import DAY_MS
+
+# Which way each signal bets; HOLD bets the price stays within the hold band
+SIGNAL_DIRECTION = np.array([-1, -1, 0, 1, 1])  # indexed like RECOMMENDATION_LABELS
+
+# Coin-days each worker process needs (~70ms of scoring) to pay for its startup
+# and for shipping its arrays; smaller inputs use fewer workers or run inline
+PARALLEL_MIN_POINTS_PER_WORKER = 50_000
+
+
+def _daily_grid(histories):
+    """Align every coin's daily prices and market caps on one day grid
+
+    Returns (days, prices, caps) where prices and caps are (coins, days)
+    arrays with NaN where a coin has no data for a day.
+    """
+    day_sets = [np.unique(timestamps // DAY_MS) for timestamps, _, _ in histories]
+    days = np.unique(np.concatenate(day_sets)) if day_sets else np.array([], dtype=np.int64)
+
+    prices = np.full((len(histories), len(days)), np.nan)
+    caps = np.full_like(prices, np.nan)
+    for row, (timestamps, coin_prices, coin_caps) in enumerate(histories):
+        # The last point of each day wins, as the daily close
+        columns = np.searchsorted(days, timestamps // DAY_MS)
+        prices[row, columns] = coin_prices
+        if coin_caps is not None:
+            caps[row, columns] = coin_caps
+    return days, prices, caps
+
+
+def market_cap_ranks(caps):
+    """Rank coins by market cap within each day (1 = largest); NaN where unknown"""
+    # Unknown caps sort last so they don't push the known ones down a rank
+    order = np.argsort(np.where(np.isnan(caps), np.inf, -caps), axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, caps.shape[0] + 1)[:, None], axis=0)
+    return np.where(np.isnan(caps), np.nan, ranks.astype(float))
+
+
+def backtest_block(prices, ranks, sustainability, window, horizons):
+    """Score every sliding window of a block of coins
+
+    ``prices`` and ``ranks`` are (coins, days) arrays and ``sustainability``
+    holds one score per coin. A window ending on day t is scored with the
+    rank on day t, and its forward return over h days is
+    prices[t + h] / prices[t] - 1.
+
+    Returns (signals, forward_returns, coin_index) for the valid windows:
+    signal indices into RECOMMENDATION_LABELS, a (windows, horizons) return
+    array with NaN past the end of the data, and the row each window came from.
+    """
+    n_coins, n_days = prices.shape
+    n_windows = n_days - window + 1
+    if n_windows <= 0:
+        return np.empty(0, dtype=int), np.empty((0, len(horizons))), np.empty(0, dtype=int)
+
+    # (coins, windows, window) views, flattened to one row per window
+    windows = sliding_window_view(prices, window, axis=1).reshape(-1, window)
+    end_prices = prices[:, window - 1:]
+    arrays = score_market_arrays(
+        ranks[:, window - 1:].reshape(-1),
+        windows,
+        np.repeat(np.asarray(sustainability, dtype=float), n_windows)
+    )
+
+    forward = np.full((n_coins, n_windows, len(horizons)), np.nan)
+    for column, horizon in enumerate(horizons):
+        if horizon < n_windows:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                forward[:, :n_windows - horizon, column] = end_prices[:, horizon:] / end_prices[:, :-horizon] - 1
+    forward = forward.reshape(-1, len(horizons))
+    forward[~np.isfinite(forward)] = np.nan
+
+    # A window needs a price on its last day to be traded
+    valid = arrays['valid'] & ~np.isnan(end_prices.reshape(-1))
+    signals = np.searchsorted(RECOMMENDATION_THRESHOLDS, arrays['score'][valid], side='right')
+    coin_index = np.repeat(np.arange(n_coins), n_windows)[valid]
+    return signals, forward[valid], coin_index
+
+
+def _backtest_chunk(args):
+    """Process pool entry point: backtest one block of coins"""
+    return backtest_block(*args)
+
+
+def summarize(signals, forward, horizons, hold_band=0.05):
+    """Hit rates and forward returns per signal
+
+    A BUY signal hits when the price rose over the horizon, a SELL when it
+    fell, and HOLD when it moved less than ``hold_band`` either way.
+    """
+    summary = {}
+    total = len(signals)
+    for index, label in enumerate(RECOMMENDATION_LABELS):
+        mask = signals == index
+        count = int(mask.sum())
+        entry = {'count': count, 'share': round(count / total, 4) if total else 0.0, 'horizons': {}}
+
+        for column, horizon in enumerate(horizons):
+            returns = forward[mask, column]
+            returns = returns[~np.isnan(returns)]
+            if not len(returns):
+                entry['horizons'][horizon] = None
+                continue
+
+            direction = SIGNAL_DIRECTION[index]
+            hits = np.abs(returns) < hold_band if direction == 0 else np.sign(returns) == direction
+            entry['horizons'][horizon] = {
+                'samples': int(len(returns)),
+                'hit_rate': round(float(hits.mean()), 4),
+                'mean_return': round(float(returns.mean()), 4),
+                'median_return': round(float(np.median(returns)), 4)
+            }
+
+        summary[str(label)] = entry
+    return summary
+
+
+class Backtester:
+    def __init__(self, analyzer=None, window=8, horizons=(1, 7, 30), workers=None, hold_band=0.05):
+        """Configure a backtest
+
+        Each signal is computed from ``window`` consecutive daily closes
+        (8 closes give the 7 daily changes of a one-week trend) and judged by
+        the returns ``horizons`` days later. Coins are spread over at most
+        ``workers`` processes (all CPUs by default; 1 runs inline), one per
+        PARALLEL_MIN_POINTS_PER_WORKER coin-days.
+
+        History is daily, so volatility is the mean absolute daily change
+        rather than the hourly figure live recommendations use, and ranks
+        are by market cap within the backtested coins.
+        """
+        if not horizons or min(horizons) < 1:
+            raise ValueError("horizons must be positive numbers of days")
+
+        self.analyzer = analyzer if analyzer is not None else CryptoAnalyzer()
+        self.window = window
+        self.horizons = tuple(horizons)
+        self.workers = workers or os.cpu_count() or 1
+        self.hold_band = hold_band
+
+    def load_history(self, coins, days=365):
+        """Fetch daily prices and market caps per coin: {coin: (timestamps, prices, caps)}"""
+        histories = {}
+        for coin in coins:
+            try:
+                history = self.analyzer.get_market_history(coin, days, interval='daily')
+            except Exception as e:
+                print(f"Error loading history for {coin}: {e}")
+                continue
+
+            if len(history[0]) >= 2:
+                histories[coin] = history
+        return histories
+
+    def run(self, histories):
+        """Backtest preloaded histories and return the report"""
+        coins = list(histories)
+        days, prices, caps = _daily_grid([histories[coin] for coin in coins])
+        ranks = market_cap_ranks(caps)
+        sustainability = np.array([
+            self.analyzer.sustainability_scores.get(coin, {'score': 5})['score'] for coin in coins
+        ], dtype=float)
+
+        workers = max(1, min(self.workers, prices.size // PARALLEL_MIN_POINTS_PER_WORKER))
+        # A few chunks per worker keeps the pool busy without shipping tiny tasks
+        chunk_size = max(1, math.ceil(len(coins) / (workers * 4)))
+        chunks = [
+            (prices[start:start + chunk_size], ranks[start:start + chunk_size],
+             sustainability[start:start + chunk_size], self.window, self.horizons)
+            for start in range(0, len(coins), chunk_size)
+        ]
+
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_backtest_chunk, chunks))
+        else:
+            results = [_backtest_chunk(chunk) for chunk in chunks]
+
+        signals = np.concatenate([result[0] for result in results]) if results else np.empty(0, dtype=int)
+        forward = np.concatenate([result[1] for result in results]) if results else np.empty((0, len(self.horizons)))
+
+        per_coin = {}
+        for chunk_number, (_, _, coin_index) in enumerate(results):
+            counts = np.bincount(coin_index, minlength=len(chunks[chunk_number][0]))
+            for offset, count in enumerate(counts):
+                per_coin[coins[chunk_number * chunk_size + offset]] = int(count)
+
+        return {
+            'coins': len(coins),
+            'days': len(days),
+            'windows': int(len(signals)),
+            'window': self.window,
+            'horizons': list(self.horizons),
+            'signals': summarize(signals, forward, self.horizons, self.hold_band),
+            'windows_per_coin': per_coin
+        }
+
+    def backtest(self, coins, days=365):
+        """Load history for ``coins`` and backtest it"""
+        return self.run(self.load_history(coins, days))
+
+
+def main():
+    """Backtest the recommendation rules from the command line"""
+    parser = argparse.ArgumentParser(description="Backtest CryptoBud's recommendation rules")
+    parser.add_argument('--coins', default='bitcoin,ethereum,cardano,solana,polkadot', help="Comma-separated CoinGecko IDs")
+    parser.add_argument('--top', type=int, help="Backtest the top N coins by market cap instead of --coins")
+    parser.add_argument('--days', default='365', help="Days of history, or 'max'")
+    parser.add_argument('--window', type=int, default=8, help="Daily closes per signal")
+    parser.add_argument('--horizons', default='1,7,30', help="Comma-separated forward return horizons in days")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all CPUs)")
+    args = parser.parse_args()
+
+    analyzer = CryptoAnalyzer()
+    if args.top:
+        screen = analyzer.screen_markets(limit=args.top) or []
+        coins = [row['id'] for row in sorted(screen, key=lambda row: row['market_cap_rank'])]
+    else:
+        coins = [coin for coin in args.coins.split(',') if coin]
+
+    backtester = Backtester(
+        analyzer, window=args.window,
+        horizons=[int(horizon) for horizon in args.horizons.split(',')],
+        workers=args.workers
+    )
+    report = backtester.backtest(coins, args.days)
+
+    print(f"📈 Backtested {report['coins']} coins, {report['days']} days, {report['windows']:,} signals")
+    print("-" * 60)
+    for label, entry in report['signals'].items():
+        print(f"{label:<13} {entry['count']:>8,} signals ({entry['share']:.1%})")
+        for horizon, stats in entry['horizons'].items():
+            if stats:
+                print(f"    {horizon:>3}d: hit rate {stats['hit_rate']:.1%}, mean return {stats['mean_return']:+.2%}, median {stats['median_return']:+.2%}")
+
+
+if __name__ == "__main__":
+    main()
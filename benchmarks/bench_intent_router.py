@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+CryptoBud Intent Router Microbenchmark
+Per-message routing cost of IntentRouter against the original if-else chain
+
+Run from the repository root:
+    python -m benchmarks.bench_intent_router
+"""
+
+import argparse
+import re
+import time
+
+from intent_router import IntentRouter, CRYPTO_KEYWORDS
+
+SAMPLE_MESSAGES = [
+    "What is the price of bitcoin?",
+    "eth price",
+    "How much is solana right now",
+    "How much does a cardano cost",
+    "Which coins are the most sustainable?",
+    "Is crypto risky?",
+    "What's the best crypto to buy?",
+    "Explain DeFi lending to me",
+    "Are NFTs still a thing",
+    "Hello there, how are you doing today?",
+    "Can you explain how proof of stake consensus works on modern blockchains in detail?",
+    "Tell me a joke",
+]
+
+LEGACY_PRICE_PATTERNS = [
+    r'price of (\w+)',
+    r'(\w+) price',
+    r'how much is (\w+)',
+    r'(\w+) cost',
+    r'current (\w+) price'
+]
+
+
+def legacy_route(message):
+    """The routing that get_response did before IntentRouter"""
+    for pattern in LEGACY_PRICE_PATTERNS:
+        match = re.search(pattern, message.lower())
+        if match:
+            return 'price', match.group(1)
+
+    message_lower = message.lower()
+    if 'sustainable' in message_lower or 'eco' in message_lower or 'green' in message_lower:
+        return 'sustainable', None
+    elif 'risky' in message_lower or 'risk' in message_lower:
+        return 'risk', None
+    elif 'best crypto' in message_lower or 'which crypto' in message_lower:
+        return 'best_crypto', None
+    elif 'defi' in message_lower:
+        return 'defi', None
+    elif 'nft' in message_lower:
+        return 'nft', None
+
+    return 'general', any(keyword in message.lower() for keyword in CRYPTO_KEYWORDS)
+
+
+def router_route(router, message):
+    """IntentRouter output in the same shape as legacy_route"""
+    result = router.route(message)
+    if result['intent'] == 'price':
+        return 'price', result['coin']
+    if result['intent'] == 'general':
+        return 'general', result['crypto_related']
+    return result['intent'], None
+
+
+def time_per_call(func, message, iterations):
+    """Mean seconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(message)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intent routing")
+    parser.add_argument('--iterations', type=int, default=20000, help="Calls per message")
+    args = parser.parse_args()
+
+    router = IntentRouter()
+
+    for message in SAMPLE_MESSAGES:
+        assert legacy_route(message) == router_route(router, message), message
+
+    print(f"{'legacy':>10} {'router':>10} {'speedup':>8}  message")
+    legacy_total = 0.0
+    router_total = 0.0
+    for message in SAMPLE_MESSAGES:
+        legacy_cost = time_per_call(legacy_route, message, args.iterations)
+        router_cost = time_per_call(router.route, message, args.iterations)
+        legacy_total += legacy_cost
+        router_total += router_cost
+        print(f"{legacy_cost * 1e6:>8.2f}us {router_cost * 1e6:>8.2f}us {legacy_cost / router_cost:>7.2f}x  {message}")
+
+    count = len(SAMPLE_MESSAGES)
+    print("-" * 60)
+    print(f"Mean per message: legacy {legacy_total / count * 1e6:.2f}us, router {router_total / count * 1e6:.2f}us")
+    print(f"Single-core routing capacity: legacy {count / legacy_total:,.0f} msg/s, router {count / router_total:,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+CryptoBud Fake CoinGecko Server
+Local stand-in for the CoinGecko endpoints CryptoBud calls, for benchmarks
+
+Serves /simple/price, /coins/markets, /coins/{id} and
+/coins/{id}/market_chart with deterministic synthetic data for any coin ID. Run standalone with:
+    python -m benchmarks.fake_coingecko --port 8765 --latency 0.05
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HOUR_MS = 3600 * 1000
+
+# /coins/markets lists these first, then made-up coins
+KNOWN_COINS = ['bitcoin', 'ethereum', 'solana', 'cardano', 'polkadot', 'polygon']
+
+
+def _rng(crypto_id):
+    return random.Random(zlib.crc32(crypto_id.encode()))
+
+
+def base_price(crypto_id):
+    """Stable made-up price for a coin"""
+    return round(10 ** _rng(crypto_id).uniform(-1, 4.7), 4)
+
+
+def price_series(crypto_id, points, end_ms=None):
+    """Random-walk [[timestamp_ms, price], ...] ending now, one point per hour"""
+    rng = _rng(crypto_id)
+    end_ms = end_ms if end_ms is not None else int(time.time() * 1000)
+    price = base_price(crypto_id)
+    drift = rng.uniform(-0.002, 0.002)
+    sigma = rng.uniform(0.002, 0.03)
+
+    series = []
+    for i in range(points):
+        series.append([end_ms - (points - 1 - i) * HOUR_MS, round(price, 6)])
+        price *= math.exp(drift + sigma * rng.gauss(0, 1))
+    return series
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops bursts of concurrent connects, which
+    # then stall for a full SYN retransmit
+    request_queue_size = 128
+
+
+class FakeCoinGecko:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, points=None, market_size=5000):
+        """Configure the server
+
+        Every response is delayed by ``latency`` seconds. market_chart
+        returns ``points`` prices when set, otherwise one per hour of the
+        requested ``days``. /coins/markets pages through ``market_size``
+        coins. Port 0 picks a free port.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.points = points
+        self.market_size = market_size
+        self.requests = Counter()
+        # Encoded market_chart bodies; generating them would otherwise dominate
+        self._charts = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Serve on a daemon thread"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Send headers and body as one write so delayed ACKs don't add latency
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, body = fake.respond(url.path, query)
+
+                payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _Server((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def respond(self, path, query):
+        """Return (status, JSON body) for a request"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        parts = path.strip('/').split('/')
+
+        if parts == ['simple', 'price']:
+            self._count('/simple/price')
+            ids = [crypto_id for crypto_id in query.get('ids', '').split(',') if crypto_id]
+            return 200, {
+                crypto_id: {'usd': base_price(crypto_id), 'usd_24h_change': round(_rng(crypto_id).uniform(-8, 8), 4)}
+                for crypto_id in ids
+            }
+
+        if parts == ['coins', 'markets']:
+            self._count('/coins/markets')
+            return 200, self.markets(int(query.get('page', 1)), min(250, int(query.get('per_page', 100))))
+
+        if len(parts) == 2 and parts[0] == 'coins':
+            self._count('/coins/{id}')
+            return 200, self.coin(parts[1])
+
+        if len(parts) == 3 and parts[0] == 'coins' and parts[2] == 'market_chart':
+            self._count('/coins/{id}/market_chart')
+            return 200, self.chart(parts[1], self.chart_points(query.get('days', '1')))
+
+        self._count('other')
+        return 404, {'error': 'not found'}
+
+    def markets(self, page, per_page):
+        """Encoded /coins/markets page with 7 day hourly sparklines"""
+        end_ms = int(time.time() * 1000) // HOUR_MS * HOUR_MS
+        key = ('markets', page, per_page, end_ms)
+        body = self._charts.get(key)
+        if body is None:
+            first = (page - 1) * per_page
+            rows = []
+            for rank in range(first + 1, min(first + per_page, self.market_size) + 1):
+                crypto_id = KNOWN_COINS[rank - 1] if rank <= len(KNOWN_COINS) else f"coin-{rank}"
+                rng = _rng(crypto_id)
+                rows.append({
+                    'id': crypto_id,
+                    'symbol': crypto_id[:4],
+                    'name': crypto_id.title(),
+                    'current_price': base_price(crypto_id),
+                    'market_cap_rank': rank,
+                    'price_change_percentage_24h_in_currency': rng.uniform(-8, 8),
+                    'price_change_percentage_7d_in_currency': rng.uniform(-20, 20),
+                    'price_change_percentage_30d_in_currency': rng.uniform(-40, 40),
+                    'sparkline_in_7d': {'price': [price for _, price in price_series(crypto_id, 168, end_ms)]}
+                })
+            body = json.dumps(rows).encode()
+            with self._lock:
+                if len(self._charts) > 256:
+                    self._charts.clear()
+                self._charts[key] = body
+        return body
+
+    def _count(self, route):
+        with self._lock:
+            self.requests[route] += 1
+
+    def chart(self, crypto_id, points):
+        """Encoded market_chart body, regenerated once the hour rolls over"""
+        end_ms = int(time.time() * 1000) // HOUR_MS * HOUR_MS
+        key = (crypto_id, points, end_ms)
+        body = self._charts.get(key)
+        if body is None:
+            prices = price_series(crypto_id, points, end_ms)
+            supply = _rng(crypto_id).uniform(1e6, 1e9)
+            body = json.dumps({
+                'prices': prices,
+                'market_caps': [[timestamp, price * supply] for timestamp, price in prices]
+            }).encode()
+            with self._lock:
+                if len(self._charts) > 256:
+                    self._charts.clear()
+                self._charts[key] = body
+        return body
+
+    def chart_points(self, days):
+        if self.points:
+            return self.points
+        try:
+            return max(2, int(float(days) * 24))
+        except ValueError:
+            return 24 * 365 * 5
+
+    def coin(self, crypto_id):
+        """Minimal /coins/{id} body with the fields the analyzer reads"""
+        rng = _rng(crypto_id)
+        price = base_price(crypto_id)
+        return {
+            'id': crypto_id,
+            'market_cap_rank': rng.randint(1, 300),
+            'market_data': {
+                'current_price': {'usd': price},
+                'price_change_percentage_24h': rng.uniform(-8, 8),
+                'price_change_percentage_7d': rng.uniform(-20, 20),
+                'price_change_percentage_30d': rng.uniform(-40, 40),
+                'market_cap': {'usd': price * rng.uniform(1e6, 1e9)}
+            }
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake CoinGecko API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--points', type=int, help="Prices per market_chart response")
+    args = parser.parse_args()
+
+    fake = FakeCoinGecko(args.host, args.port, args.latency, args.points).start()
+    print(f"Fake CoinGecko API at {fake.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+CryptoBud Benchmark Suite
+Startup time, chat latency, analyzer throughput and memory against a local fake CoinGecko
+
+Run from the repository root:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --latency 0.05 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.fake_coingecko import FakeCoinGecko
+from coingecko_async import AsyncCoinGeckoClient
+from crypto_analyzer import CryptoAnalyzer
+from rate_limit import RateLimiter
+from ttl_cache import TTLCache
+
+# One representative message per routing outcome of get_response
+INTENT_MESSAGES = {
+    'price': "What is the price of bitcoin?",
+    'sustainable': "Which coins are the most sustainable?",
+    'risk': "Is crypto risky?",
+    'best_crypto': "What's the best crypto to buy?",
+    'defi': "Explain DeFi lending to me",
+    'nft': "Are NFTs still a thing",
+    'general': "Hello there, how are you doing today?",
+    'general_crypto': "What is blockchain?",
+}
+
+
+def percentiles(samples):
+    """p50/p99/mean of a list of seconds, in milliseconds"""
+    values = np.asarray(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'mean_ms': round(float(values.mean()), 3)
+    }
+
+
+def unthrottled():
+    """Retry transient errors but never wait for tokens; the fake has no quota"""
+    return RateLimiter(rate=None)
+
+
+def no_cache():
+    """A cache whose entries expire immediately, so every call hits the server"""
+    return TTLCache(ttl=0, stale_ttl=0, negative_ttl=0)
+
+
+def bench_startup(fake, workdir):
+    """Cold (training), warm (snapshot hit) and fast-start CryptoBudBot construction
+
+    Fast start is timed up to the first answered rule-based message.
+    """
+    from chatbot import CryptoBudBot
+
+    database_path = os.path.join(workdir, 'bench.sqlite3')
+    results = {}
+    for label in ('cold', 'warm'):
+        start = time.perf_counter()
+        CryptoBudBot(database_path=database_path, coingecko_api=fake.base_url, rate_limiter=unthrottled())
+        results[f"{label}_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    bot = CryptoBudBot(database_path=database_path, coingecko_api=fake.base_url, rate_limiter=unthrottled(), lazy=True)
+    bot.get_response(INTENT_MESSAGES['risk'])
+    results['fast_start_s'] = round(time.perf_counter() - start, 3)
+    return results, database_path
+
+
+def bench_intents(fake, database_path, iterations):
+    """Per-intent get_response latency; price lookups bypass the cache"""
+    from chatbot import CryptoBudBot
+
+    bot = CryptoBudBot(
+        database_path=database_path, coingecko_api=fake.base_url,
+        rate_limiter=unthrottled(), price_cache=no_cache()
+    )
+
+    results = {}
+    for intent, message in INTENT_MESSAGES.items():
+        bot.get_response(message)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            bot.get_response(message)
+            samples.append(time.perf_counter() - start)
+        results[intent] = percentiles(samples)
+    return results
+
+
+def bench_analyzer(fake, coin_counts, series_lengths, rounds):
+    """Recommendations per second, sequential (sync) and concurrent (async)"""
+    results = []
+    for points in series_lengths:
+        fake.points = points
+        for count in coin_counts:
+            coins = [f"coin-{i}" for i in range(count)]
+            analyzer = CryptoAnalyzer(coingecko_api=fake.base_url, rate_limiter=unthrottled(), market_cache=no_cache())
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for coin in coins:
+                    analyzer.get_investment_recommendation(coin)
+            sync_elapsed = time.perf_counter() - start
+
+            async def run_async():
+                async with AsyncCoinGeckoClient(fake.base_url, rate_limiter=analyzer.rate_limiter) as client:
+                    for _ in range(rounds):
+                        await asyncio.gather(*(
+                            analyzer.get_investment_recommendation_async(coin, client=client) for coin in coins
+                        ))
+
+            start = time.perf_counter()
+            asyncio.run(run_async())
+            async_elapsed = time.perf_counter() - start
+
+            total = count * rounds
+            results.append({
+                'coins': count,
+                'series_length': points,
+                'sync_per_s': round(total / sync_elapsed, 1),
+                'async_per_s': round(total / async_elapsed, 1)
+            })
+    fake.points = None
+    return results
+
+
+def bench_screener(fake, limit):
+    """Time to screen the top ``limit`` coins and the upstream calls it took"""
+    analyzer = CryptoAnalyzer(coingecko_api=fake.base_url, rate_limiter=unthrottled(), market_cache=no_cache())
+    before = fake.requests['/coins/markets']
+
+    start = time.perf_counter()
+    rows = analyzer.screen_markets(limit=limit)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'coins': len(rows or []),
+        'seconds': round(elapsed, 3),
+        'upstream_calls': fake.requests['/coins/markets'] - before
+    }
+
+
+def bench_memory(fake, coins, points):
+    """Peak Python allocations while recommending ``coins`` coins"""
+    fake.points = points
+    analyzer = CryptoAnalyzer(coingecko_api=fake.base_url, rate_limiter=unthrottled(), market_cache=no_cache())
+
+    tracemalloc.start()
+    for i in range(coins):
+        analyzer.get_investment_recommendation(f"coin-{i}")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    fake.points = None
+    return {
+        'analyzer_peak_kib': round(peak / 1024, 1),
+        # ru_maxrss is KiB on Linux
+        'process_max_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def print_report(results):
+    if 'startup' in results:
+        startup = results['startup']
+        print(f"\nStartup: cold {startup['cold_s']:.2f}s, warm {startup['warm_s']:.2f}s, fast start to first answer {startup['fast_start_s']:.3f}s")
+
+    if 'intents' in results:
+        print(f"\n{'intent':<16} {'p50':>9} {'p99':>9} {'mean':>9}")
+        for intent, stats in results['intents'].items():
+            print(f"{intent:<16} {stats['p50_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms {stats['mean_ms']:>7.2f}ms")
+
+    print(f"\n{'coins':>6} {'points':>7} {'sync/s':>9} {'async/s':>9}")
+    for row in results['analyzer']:
+        print(f"{row['coins']:>6} {row['series_length']:>7} {row['sync_per_s']:>9.1f} {row['async_per_s']:>9.1f}")
+
+    screener = results['screener']
+    print(f"\nScreener: {screener['coins']} coins in {screener['seconds']:.2f}s with {screener['upstream_calls']} upstream calls")
+
+    memory = results['memory']
+    print(f"\nMemory: analyzer peak {memory['analyzer_peak_kib']:.1f} KiB, process max RSS {memory['process_max_rss_mib']:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the CryptoBud benchmarks against a fake CoinGecko API")
+    parser.add_argument('--latency', type=float, default=0.02, help="Seconds the fake API waits per response")
+    parser.add_argument('--iterations', type=int, default=50, help="get_response calls per intent")
+    parser.add_argument('--coins', default='1,4,16', help="Comma-separated coin counts for analyzer throughput")
+    parser.add_argument('--series', default='168,720,4320', help="Comma-separated market_chart lengths")
+    parser.add_argument('--rounds', type=int, default=3, help="Passes over the coins per analyzer measurement")
+    parser.add_argument('--screen', type=int, default=500, help="Coins to rank in the screener benchmark")
+    parser.add_argument('--skip-bot', action='store_true', help="Skip startup and chat benchmarks (no ChatterBot needed)")
+    parser.add_argument('--json', metavar='PATH', help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    coin_counts = [int(value) for value in args.coins.split(',')]
+    series_lengths = [int(value) for value in args.series.split(',')]
+    results = {'latency_s': args.latency}
+
+    with FakeCoinGecko(latency=args.latency) as fake, tempfile.TemporaryDirectory() as workdir:
+        print(f"Fake CoinGecko at {fake.base_url} ({args.latency * 1000:.0f}ms latency)")
+
+        if not args.skip_bot:
+            results['startup'], database_path = bench_startup(fake, workdir)
+            results['intents'] = bench_intents(fake, database_path, args.iterations)
+
+        results['analyzer'] = bench_analyzer(fake, coin_counts, series_lengths, args.rounds)
+        results['screener'] = bench_screener(fake, args.screen)
+        results['memory'] = bench_memory(fake, max(coin_counts), max(series_lengths))
+        results['upstream_requests'] = dict(fake.requests)
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
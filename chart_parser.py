@@ -0,0 +1,144 @@
+"""
+CryptoBud Market Chart Parser
+Incremental parser that streams one series of a market_chart body into typed arrays
+"""
+
+import re
+from array import array
+
+import numpy as np
+
+# Bytes requested from the socket per read
+CHUNK_SIZE = 64 * 1024
+
+# After the wanted series, read at most this much more of a body so the
+# pooled connection can be reused; longer tails are cut off by closing it
+DRAIN_LIMIT = 256 * 1024
+
+# The series key's colon and opening bracket
+_LIST_START = re.compile(rb'\s*:\s*\[')
+# The closing bracket of the last pair and of the list itself
+_LIST_END = re.compile(rb'\]\s*\]')
+_VALUE_SEPARATORS = re.compile(rb'[\[\]\s]+')
+
+
+class MarketChartParser:
+    def __init__(self, series='prices'):
+        """Collect the ``series`` list of [timestamp, value] pairs from a market_chart body
+
+        Feed the body in chunks of any size. Only the current chunk and a few
+        bytes of carry-over are held at a time; the pairs land in two
+        ``array('d')`` columns, 16 bytes per point. Everything after the
+        series (CoinGecko sends market_caps and total_volumes next) is
+        ignored, so callers can stop reading once ``done`` is set.
+        """
+        self.key = f'"{series}"'.encode()
+        self.timestamps = array('d')
+        self.values = array('d')
+        self.done = False
+        self._buffer = b''
+        self._in_list = False
+
+    def feed(self, chunk):
+        """Parse the next chunk of the body; returns True once the series is complete"""
+        if self.done:
+            return True
+
+        buffer = self._buffer + chunk
+        if not self._in_list:
+            buffer = self._find_list(buffer)
+            if buffer is None:
+                return False
+
+        if not len(self.timestamps) and buffer.lstrip().startswith(b']'):
+            # An empty series
+            self._buffer = b''
+            self.done = True
+            return True
+
+        end = _LIST_END.search(buffer)
+        if end is not None:
+            self._parse_pairs(buffer[:end.start() + 1])
+            self._buffer = b''
+            self.done = True
+            return True
+
+        # Parse every complete pair and carry the partial one over, along
+        # with the last closing bracket in case the list ends next chunk
+        cut = buffer.rfind(b']') + 1
+        self._parse_pairs(buffer[:cut])
+        self._buffer = buffer[max(cut - 1, 0):]
+        return False
+
+    def _find_list(self, buffer):
+        """Skip to just inside the series' list, or keep enough bytes to retry"""
+        start = buffer.find(self.key)
+        if start < 0:
+            # The key may straddle this chunk and the next
+            self._buffer = buffer[-len(self.key):]
+            return None
+
+        match = _LIST_START.match(buffer, start + len(self.key))
+        if match is None:
+            if len(buffer) - start > len(self.key) + 64:
+                raise ValueError(f"{self.key.decode()} in the market_chart body is not a list")
+            self._buffer = buffer[start:]
+            return None
+
+        self._in_list = True
+        return buffer[match.end():]
+
+    def _parse_pairs(self, text):
+        """Append the pairs in ``[t, v],[t, v]`` (a leading comma allowed) to the columns"""
+        text = _VALUE_SEPARATORS.sub(b'', text).strip(b',')
+        if not text:
+            return
+
+        expected = text.count(b',') + 1
+        parsed = np.fromstring(text.replace(b'null', b'nan').decode('ascii'), dtype=float, sep=',') \
+            if expected % 2 == 0 else None
+        if parsed is None or len(parsed) != expected:
+            raise ValueError("Malformed [timestamp, value] pairs in the market_chart body")
+
+        self.timestamps.frombytes(parsed[0::2].tobytes())
+        self.values.frombytes(parsed[1::2].tobytes())
+
+    def result(self):
+        """The series as (int64 timestamps in ms, float64 values) NumPy arrays"""
+        if not self.done:
+            raise ValueError(f"market_chart body ended before {self.key.decode()} was complete")
+        # The value column is a zero-copy view of the array('d') buffer
+        return np.frombuffer(self.timestamps, dtype=float).astype(np.int64), np.frombuffer(self.values, dtype=float)
+
+
+def parse_market_chart(chunks, series='prices', drain_limit=DRAIN_LIMIT):
+    """Parse ``series`` from an iterator of body chunks
+
+    Once the series is complete, up to ``drain_limit`` more bytes are read
+    and dropped so a short tail doesn't cost the connection.
+    """
+    result = parse_market_chart_series(chunks, (series,), drain_limit)[series]
+    if result is None:
+        raise ValueError(f"market_chart body ended before \"{series}\" was complete")
+    return result
+
+
+def parse_market_chart_series(chunks, series=('prices', 'market_caps'), drain_limit=DRAIN_LIMIT):
+    """Parse several series from one pass over an iterator of body chunks
+
+    Returns {series: (timestamps, values)}, with None for a series the body
+    doesn't have in full. Reading stops once every series is complete.
+    """
+    chunks = iter(chunks)
+    parsers = {name: MarketChartParser(name) for name in series}
+    for chunk in chunks:
+        # Every parser sees every chunk; each skips ahead to its own key
+        if all([parser.feed(chunk) for parser in parsers.values()]):
+            break
+
+    drained = 0
+    for chunk in chunks:
+        drained += len(chunk)
+        if drained > drain_limit:
+            break
+    return {name: parser.result() if parser.done else None for name, parser in parsers.items()}
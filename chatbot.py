@@ -4,20 +4,395 @@ CryptoBud Python ChatterBot Integration
 Proprietary cryptocurrency chatbot with advanced conversation flow
 """
 
-from chatterbot import ChatBot
-from chatterbot.trainers import ChatterBotCorpusTrainer, ListTrainer
 import requests
+import argparse
+import hashlib
 import json
-import re
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from coingecko_async import COINGECKO_API
+from intent_router import IntentRouter
+from metrics import METRICS, CHAT_SECONDS, CHAT_STAGE_SECONDS, UPSTREAM_ERRORS, UPSTREAM_SECONDS, timed, watch_cache, watch_storage
+from rate_limit import COINGECKO_LIMITER
+from ttl_cache import TTLCache
+
+DEFAULT_DATABASE_PATH = 'cryptobud.sqlite3'
+
+# How learned statements reach the database: synchronously on every turn,
+# batched by a background writer, or not at all from a read-only replica
+STORAGE_MODES = ('sync', 'write_behind', 'replica')
+
+# Bump when the training procedure changes in a way the content hash can't see
+TRAINING_VERSION = 1
+
+# Crypto conversation training data
+CRYPTO_CONVERSATIONS = [
+    "Hello",
+    "Hi! I'm CryptoBud, your proprietary cryptocurrency intelligence platform. How can I help you today?",
+
+    "What is Bitcoin?",
+    "Bitcoin is the first and largest cryptocurrency by market cap. It uses Proof of Work consensus and was created by Satoshi Nakamoto in 2009.",
+
+    "What is Ethereum?",
+    "Ethereum is a blockchain platform that enables smart contracts and decentralized applications. It recently transitioned to Proof of Stake consensus.",
+
+    "Should I invest in crypto?",
+    "Cryptocurrency investments are extremely risky and volatile. Always do your own research and never invest more than you can afford to lose. Consider consulting a financial advisor.",
+
+    "What is the most sustainable crypto?",
+    "Cardano and Ethereum are among the most sustainable cryptocurrencies due to their Proof of Stake consensus mechanisms, which use significantly less energy than Bitcoin's Proof of Work.",
+
+    "How do I buy cryptocurrency?",
+    "You can buy cryptocurrency through exchanges like Coinbase, Binance, or Kraken. Always use reputable exchanges and secure your assets in a hardware wallet.",
+
+    "What is blockchain?",
+    "Blockchain is a distributed ledger technology that records transactions across multiple computers in a way that makes them difficult to alter or hack.",
+
+    "Thank you",
+    "You're welcome! Remember to always do your own research before making any investment decisions. Stay safe in the crypto world!",
+
+    "Goodbye",
+    "Goodbye! Thanks for using CryptoBud. Come back anytime for the latest crypto insights and analysis!"
+]
+
+# General English corpora for better conversation flow
+TRAINING_CORPORA = [
+    "chatterbot.corpus.english.greetings",
+    "chatterbot.corpus.english.conversations"
+]
+
+SNAPSHOT_TABLE = 'cryptobud_training_snapshot'
+
+# Convert common names to CoinGecko IDs
+CRYPTO_IDS = {
+    'bitcoin': 'bitcoin',
+    'btc': 'bitcoin',
+    'ethereum': 'ethereum',
+    'eth': 'ethereum',
+    'cardano': 'cardano',
+    'ada': 'cardano',
+    'solana': 'solana',
+    'sol': 'solana'
+}
+
+# Popular coins are fetched alongside any price lookup that misses the cache
+PREFETCH_IDS = sorted(set(CRYPTO_IDS.values()))
+
+# Shared by every bot in the process so concurrent chats reuse one fetch
+PRICE_CACHE = TTLCache(ttl=30, stale_ttl=120, negative_ttl=60, max_size=2048)
+
+# Seconds a chat turn may spend throttled or retrying a price fetch before
+# it answers without the price rather than hold its worker thread
+PRICE_MAX_WAIT = 2.0
+watch_cache('prices', PRICE_CACHE)
+
+INTENT_ROUTER = IntentRouter(aliases=CRYPTO_IDS)
+
+# Canned answers for the rule-based intents IntentRouter recognises
+RULE_RESPONSES = {
+    'sustainable': "🌱 The most sustainable cryptocurrencies are those using Proof of Stake consensus like Cardano (ADA), Ethereum 2.0, and Solana. They use 99% less energy than Bitcoin!",
+    'risk': "⚠️ Cryptocurrency investments are extremely risky! Prices can fluctuate wildly, you could lose everything, and the market is largely unregulated. Never invest more than you can afford to lose!",
+    'best_crypto': "🎯 I can't recommend specific investments, but consider factors like: technology, team, use case, market cap, and sustainability. Popular options include Bitcoin (store of value), Ethereum (smart contracts), and Cardano (sustainability). Always do your own research!",
+    'defi': "🏦 DeFi (Decentralized Finance) refers to financial services built on blockchain technology, eliminating traditional intermediaries like banks. Examples include lending, borrowing, and trading on platforms like Uniswap and Compound.",
+    'nft': "🎨 NFTs (Non-Fungible Tokens) are unique digital assets stored on blockchain. They can represent art, collectibles, or other digital items. The market is highly speculative and volatile."
+}
+
+
+def _corpus_version():
+    """Return the installed chatterbot-corpus version, if it can be found"""
+    try:
+        from importlib.metadata import version
+        return version('chatterbot-corpus')
+    except Exception:
+        return None
+
+
+def training_hash(conversations=None, corpora=None):
+    """Content hash of everything that goes into training the bot"""
+    payload = json.dumps({
+        'version': TRAINING_VERSION,
+        'conversations': CRYPTO_CONVERSATIONS if conversations is None else conversations,
+        'corpora': TRAINING_CORPORA if corpora is None else corpora,
+        'corpus_version': _corpus_version()
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def read_training_snapshot(database_path):
+    """Read the training snapshot recorded in a database, or None"""
+    if not os.path.exists(database_path):
+        return None
+    try:
+        connection = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+        try:
+            rows = connection.execute(f"SELECT key, value FROM {SNAPSHOT_TABLE}").fetchall()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    return dict(rows) if rows else None
+
+
+def write_training_snapshot(database_path, digest):
+    """Record which training content the database was built from"""
+    connection = sqlite3.connect(database_path)
+    try:
+        with connection:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {SNAPSHOT_TABLE} (key, value) VALUES (?, ?)",
+                [('hash', digest), ('trained_at', datetime.now().isoformat())]
+            )
+    finally:
+        connection.close()
+
+
+def delete_training_statements(database_path):
+    """Remove what earlier training stored, keeping learned conversations
+
+    ChatterBot's trainers tag everything they store with the 'training'
+    conversation and only ever append, so retraining on top would
+    duplicate every trained statement.
+    """
+    connection = sqlite3.connect(database_path)
+    try:
+        with connection:
+            connection.execute(
+                "DELETE FROM tag_association WHERE statement_id IN "
+                "(SELECT id FROM statement WHERE conversation = 'training')"
+            )
+            connection.execute("DELETE FROM statement WHERE conversation = 'training'")
+    finally:
+        connection.close()
+
+
+@contextmanager
+def training_lock(database_path):
+    """Hold an exclusive lock on the database's training, across processes"""
+    try:
+        import fcntl
+    except ImportError:
+        # No advisory locks on this platform
+        yield
+        return
+
+    with open(f"{database_path}.train.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def fetch_prices(crypto_ids, session=None, coingecko_api=COINGECKO_API, rate_limiter=COINGECKO_LIMITER, max_wait=None):
+    """Fetch raw prices for a batch of CoinGecko IDs in one rate-limited request
+
+    ``max_wait`` bounds the whole lookup: time spent throttled or retrying,
+    as in RateLimiter.call, and each request's timeout.
+    """
+    session = session or requests
+    params = {
+        'ids': ','.join(crypto_ids),
+        'vs_currencies': 'usd',
+        'include_24hr_change': 'true'
+    }
+
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+
+    def request():
+        timeout = 10 if deadline is None else min(10, max(deadline - time.monotonic(), 0.1))
+        with METRICS.timer(UPSTREAM_SECONDS, error_counter=UPSTREAM_ERRORS, endpoint='/simple/price'):
+            response = session.get(f"{coingecko_api}/simple/price", params=params, timeout=timeout)
+            # Raise on errors like 429 so they're retried, not cached as unknown coins
+            response.raise_for_status()
+            return response.json()
+
+    data = rate_limiter.call(request, max_wait=max_wait)
+    return {
+        crypto_id: {'price': values['usd'], 'change_24h': values.get('usd_24h_change', 0)}
+        for crypto_id, values in data.items()
+        if isinstance(values, dict) and 'usd' in values
+    }
+
+
+def bake_prebuilt_database(path):
+    """Train into a fresh database and freeze it, with its statement index, for read-only workers"""
+    tmp_path = f"{path}.tmp"
+    for leftover in (tmp_path, f"{tmp_path}-wal", f"{tmp_path}-shm", f"{tmp_path}.index"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    bot = CryptoBudBot(database_path=tmp_path, vector_index=True)
+    bot.close()
+
+    # Fold the WAL back into the main file so the snapshot is self-contained
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.execute("PRAGMA journal_mode=DELETE")
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, path)
+    os.chmod(path, 0o444)
+    os.replace(f"{tmp_path}.index", f"{path}.index")
+    os.remove(f"{tmp_path}.train.lock")
+    return path
+
 
 class CryptoBudBot:
-    def __init__(self):
-        """Initialize the CryptoBud chatbot with ChatterBot"""
-        self.chatbot = ChatBot(
+    def __init__(self, database_path=DEFAULT_DATABASE_PATH, prebuilt_database=None, retrain=False,
+                 price_cache=None, vector_index=False, coingecko_api=COINGECKO_API, rate_limiter=None,
+                 price_max_wait=PRICE_MAX_WAIT, lazy=False, warm=False, storage_mode='sync'):
+        """Initialize the CryptoBud chatbot with ChatterBot
+
+        Training is skipped when the database already holds a snapshot of the
+        current training content. Pass ``prebuilt_database`` to open a database
+        made by ``bake_prebuilt_database`` read-only, without training or learning.
+        Prices are shared through PRICE_CACHE unless ``price_cache`` is given.
+        With ``vector_index``, BestMatch finds candidates through a TF-IDF
+        StatementIndex kept next to the database instead of scanning it.
+        Price calls go through ``rate_limiter``, the shared CoinGecko limiter
+        by default, and give up after ``price_max_wait`` seconds of throttling
+        or retries (None waits as long as it takes).
+
+        With ``lazy``, ChatterBot isn't imported or built until a message
+        needs the conversational fallback, so price and rule-based answers
+        are available immediately. ``warm`` starts loading it on a background
+        thread right away.
+
+        ``storage_mode`` is one of STORAGE_MODES. 'write_behind' queues what
+        ChatterBot learns and stores it in batched transactions off the
+        request path. 'replica' serves from a database another bot trains
+        and learns into, opened read-only so it never writes or locks it.
+        """
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"storage_mode must be one of {', '.join(STORAGE_MODES)}")
+
+        self.prebuilt = prebuilt_database is not None
+        self.storage_mode = storage_mode
+        # Neither a baked snapshot nor a replica ever trains or learns
+        self.read_only = self.prebuilt or storage_mode == 'replica'
+        self.database_path = prebuilt_database if self.prebuilt else database_path
+        self.retrain = retrain
+        self.vector_index = vector_index
+        self.statement_index = None
+
+        # Crypto API configuration
+        self.coingecko_api = coingecko_api
+        self.session = requests.Session()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else COINGECKO_LIMITER
+        self.price_max_wait = price_max_wait
+        self.price_cache = price_cache if price_cache is not None else PRICE_CACHE
+        self.router = INTENT_ROUTER
+
+        self._chatbot = None
+        self._chatbot_ready = False
+        # Reentrant: loading reads self.chatbot while training and indexing
+        self._chatbot_lock = threading.RLock()
+
+        if not lazy:
+            self._load_chatbot()
+        elif warm:
+            self.warm_up()
+
+    @property
+    def chatbot(self):
+        """The ChatterBot engine, imported and built on first use"""
+        if self._chatbot_ready:
+            return self._chatbot
+
+        with self._chatbot_lock:
+            if self._chatbot is None:
+                self._load_chatbot()
+            return self._chatbot
+
+    @property
+    def chatbot_loaded(self):
+        return self._chatbot_ready
+
+    def warm_up(self):
+        """Load ChatterBot on a daemon thread"""
+        def load():
+            try:
+                self.chatbot
+            except Exception as e:
+                print(f"Error loading ChatterBot: {e}")
+
+        thread = threading.Thread(target=load, name='cryptobud-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """Write out queued statements and release the database connections"""
+        with self._chatbot_lock:
+            if self._chatbot is None:
+                return
+            storage = self._chatbot.storage
+            if hasattr(storage, 'flush'):
+                # WriteBehindSQLStorageAdapter
+                storage.close()
+            storage.engine.dispose()
+
+    def _load_chatbot(self):
+        """Import, build and train ChatterBot once"""
+        with self._chatbot_lock:
+            if self._chatbot_ready:
+                return
+
+            start = time.perf_counter()
+            try:
+                self._chatbot = self._build_chatbot()
+
+                # Train the bot with crypto-specific conversations
+                if self.read_only:
+                    snapshot = read_training_snapshot(self.database_path)
+                    if not snapshot or snapshot.get('hash') != training_hash():
+                        kind = 'prebuilt' if self.prebuilt else 'replica'
+                        print(f"Warning: {kind} database {self.database_path} is out of date with the training data")
+                else:
+                    self.ensure_trained(force=self.retrain)
+
+                if self.vector_index:
+                    self.attach_statement_index()
+                self._instrument_chatterbot()
+                if self.storage_mode == 'write_behind' and not self.read_only:
+                    watch_storage('conversations', self._chatbot.storage)
+            except Exception:
+                self._chatbot = None
+                raise
+
+            self._chatbot_ready = True
+            METRICS.observe('cryptobud_chatterbot_load_seconds', time.perf_counter() - start)
+
+    def _build_chatbot(self):
+        """Construct the ChatBot engine for this bot's database"""
+        from chatterbot import ChatBot
+
+        storage_adapter = 'chatterbot.storage.SQLStorageAdapter'
+        if self.prebuilt:
+            # immutable=1 lets SQLite skip locking entirely on the frozen file
+            database_uri = f"sqlite:///file:{self.database_path}?immutable=1&uri=true"
+        elif self.storage_mode == 'replica':
+            # mode=ro still sees what the primary commits to its WAL
+            database_uri = f"sqlite:///file:{self.database_path}?mode=ro&uri=true"
+        else:
+            database_uri = f"sqlite:///{self.database_path}"
+            if self.storage_mode == 'write_behind':
+                storage_adapter = 'sql_storage.WriteBehindSQLStorageAdapter'
+
+        return ChatBot(
             'CryptoBud',
-            storage_adapter='chatterbot.storage.SQLStorageAdapter',
-            database_uri='sqlite:///cryptobud.sqlite3',
+            read_only=self.read_only,
+            storage_adapter=storage_adapter,
+            database_uri=database_uri,
             logic_adapters=[
                 {
                     'import_path': 'chatterbot.logic.BestMatch',
@@ -32,172 +407,217 @@ class CryptoBudBot:
                 }
             ]
         )
+
+    def ensure_trained(self, force=False):
+        """Train only if the stored snapshot doesn't match the training content
+
+        Processes starting on the same stale database train one at a time;
+        the others find the fresh snapshot once they get the lock. Earlier
+        training is deleted first, so retraining replaces it.
+        """
+        digest = training_hash()
+        snapshot = read_training_snapshot(self.database_path)
+        if not force and snapshot and snapshot.get('hash') == digest:
+            return False
+
+        with training_lock(self.database_path):
+            snapshot = read_training_snapshot(self.database_path)
+            if not force and snapshot and snapshot.get('hash') == digest:
+                return False
+
+            delete_training_statements(self.database_path)
+            # The saved statement index still holds the deleted statements
+            index_path = f"{self.database_path}.index"
+            if os.path.exists(index_path):
+                os.remove(index_path)
+
+            self.train_crypto_knowledge()
+            write_training_snapshot(self.database_path, digest)
+        return True
         
-        # Train the bot with crypto-specific conversations
-        self.train_crypto_knowledge()
-        
-        # Crypto API configuration
-        self.coingecko_api = "https://api.coingecko.com/api/v3"
-        
+    def attach_statement_index(self):
+        """Load or build the statement index and route BestMatch searches through it"""
+        from chatterbot.logic import BestMatch
+        from statement_index import StatementIndex, VectorIndexSearch
+
+        index_path = f"{self.database_path}.index"
+        digest = training_hash()
+        storage = self.chatbot.storage
+
+        index = StatementIndex.load(index_path, digest)
+        if index is None:
+            # First run after (re)training: index the whole statement table
+            index = StatementIndex.from_storage(storage)
+            if not self.read_only:
+                index.save(index_path, digest)
+        elif not self.prebuilt:
+            # Pick up statements learned since the index was saved
+            index.sync(storage)
+
+        for adapter in self.chatbot.logic_adapters:
+            if isinstance(adapter, BestMatch):
+                adapter.search_algorithm = VectorIndexSearch(self.chatbot, index, adapter.search_algorithm)
+
+        self.statement_index = index
+        return index
+
+    def _instrument_chatterbot(self):
+        """Time ChatterBot's tagging, logic adapters and storage writes as separate stages"""
+        storage = self.chatbot.storage
+        storage.tagger.get_bigram_pair_string = timed(storage.tagger.get_bigram_pair_string, CHAT_STAGE_SECONDS, stage='tagging')
+        for method in ('create', 'update'):
+            setattr(storage, method, timed(getattr(storage, method), CHAT_STAGE_SECONDS, stage='storage_write'))
+        for adapter in self.chatbot.logic_adapters:
+            adapter.process = timed(adapter.process, CHAT_STAGE_SECONDS, stage=f"logic:{adapter.class_name}")
+
+    def _index_learned_statement(self, message):
+        """Add a message ChatterBot just learned to the statement index"""
+        if self.statement_index is None or self.chatbot.read_only:
+            return
+
+        # Apply the same preprocessing ChatterBot used before storing it
+        statement = self.chatbot.storage.get_object('statement')(text=message)
+        for preprocessor in self.chatbot.preprocessors:
+            statement = preprocessor(statement)
+        self.statement_index.add(statement.text)
+        self.statement_index.maybe_rebuild()
+
     def train_crypto_knowledge(self):
         """Train the bot with cryptocurrency-specific knowledge"""
+        from chatterbot.trainers import ChatterBotCorpusTrainer, ListTrainer
+
         trainer = ListTrainer(self.chatbot)
         
-        # Crypto conversation training data
-        crypto_conversations = [
-            "Hello",
-            "Hi! I'm CryptoBud, your proprietary cryptocurrency intelligence platform. How can I help you today?",
-            
-            "What is Bitcoin?",
-            "Bitcoin is the first and largest cryptocurrency by market cap. It uses Proof of Work consensus and was created by Satoshi Nakamoto in 2009.",
-            
-            "What is Ethereum?",
-            "Ethereum is a blockchain platform that enables smart contracts and decentralized applications. It recently transitioned to Proof of Stake consensus.",
-            
-            "Should I invest in crypto?",
-            "Cryptocurrency investments are extremely risky and volatile. Always do your own research and never invest more than you can afford to lose. Consider consulting a financial advisor.",
-            
-            "What is the most sustainable crypto?",
-            "Cardano and Ethereum are among the most sustainable cryptocurrencies due to their Proof of Stake consensus mechanisms, which use significantly less energy than Bitcoin's Proof of Work.",
-            
-            "How do I buy cryptocurrency?",
-            "You can buy cryptocurrency through exchanges like Coinbase, Binance, or Kraken. Always use reputable exchanges and secure your assets in a hardware wallet.",
-            
-            "What is blockchain?",
-            "Blockchain is a distributed ledger technology that records transactions across multiple computers in a way that makes them difficult to alter or hack.",
-            
-            "Thank you",
-            "You're welcome! Remember to always do your own research before making any investment decisions. Stay safe in the crypto world!",
-            
-            "Goodbye",
-            "Goodbye! Thanks for using CryptoBud. Come back anytime for the latest crypto insights and analysis!"
-        ]
-        
-        trainer.train(crypto_conversations)
+        trainer.train(CRYPTO_CONVERSATIONS)
         
         # Train with general English corpus for better conversation flow
         corpus_trainer = ChatterBotCorpusTrainer(self.chatbot)
-        corpus_trainer.train("chatterbot.corpus.english.greetings")
-        corpus_trainer.train("chatterbot.corpus.english.conversations")
+        for corpus in TRAINING_CORPORA:
+            corpus_trainer.train(corpus)
         
     def get_crypto_price(self, crypto_name):
         """Fetch real-time cryptocurrency price from CoinGecko API"""
+        return self.get_crypto_prices([crypto_name]).get(crypto_name)
+
+    def get_crypto_prices(self, crypto_names):
+        """Fetch prices for many cryptocurrencies with at most one API call
+
+        Prices come from the shared TTL cache. Whenever a fetch is needed, the
+        coins in CRYPTO_IDS that aren't fresh are fetched along with it.
+        """
+        # Convert common names to CoinGecko IDs
+        ids_by_name = {name: CRYPTO_IDS.get(name.lower(), name.lower()) for name in crypto_names}
+
         try:
-            # Convert common names to CoinGecko IDs
-            crypto_ids = {
-                'bitcoin': 'bitcoin',
-                'btc': 'bitcoin',
-                'ethereum': 'ethereum',
-                'eth': 'ethereum',
-                'cardano': 'cardano',
-                'ada': 'cardano',
-                'solana': 'solana',
-                'sol': 'solana'
-            }
-            
-            crypto_id = crypto_ids.get(crypto_name.lower(), crypto_name.lower())
-            
-            url = f"{self.coingecko_api}/simple/price"
-            params = {
-                'ids': crypto_id,
-                'vs_currencies': 'usd',
-                'include_24hr_change': 'true'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            
-            if crypto_id in data:
-                price = data[crypto_id]['usd']
-                change = data[crypto_id].get('usd_24h_change', 0)
-                
-                return {
-                    'price': price,
-                    'change_24h': change,
-                    'formatted_price': f"${price:,.2f}",
-                    'formatted_change': f"{change:+.2f}%"
-                }
-            else:
-                return None
-                
+            raw_prices = self.price_cache.get_many(
+                ids_by_name.values(), self._fetch_prices, extra_keys=PREFETCH_IDS
+            )
         except Exception as e:
             print(f"Error fetching price data: {e}")
+            return {name: None for name in crypto_names}
+
+        return {name: self._format_price(raw_prices.get(crypto_id)) for name, crypto_id in ids_by_name.items()}
+
+    def _fetch_prices(self, crypto_ids):
+        """Fetch raw prices for a batch of CoinGecko IDs in one request"""
+        return fetch_prices(crypto_ids, self.session, self.coingecko_api, self.rate_limiter, self.price_max_wait)
+
+    def _format_price(self, raw_price):
+        """Build the price dict returned by get_crypto_price"""
+        if not raw_price:
             return None
+
+        price = raw_price['price']
+        change = raw_price['change_24h'] or 0
+
+        return {
+            'price': price,
+            'change_24h': change,
+            'formatted_price': f"${price:,.2f}",
+            'formatted_change': f"{change:+.2f}%"
+        }
     
     def is_crypto_price_query(self, message):
         """Check if the message is asking for cryptocurrency price"""
-        price_patterns = [
-            r'price of (\w+)',
-            r'(\w+) price',
-            r'how much is (\w+)',
-            r'(\w+) cost',
-            r'current (\w+) price'
-        ]
-        
-        for pattern in price_patterns:
-            match = re.search(pattern, message.lower())
-            if match:
-                return match.group(1)
-        return None
+        route = self.router.route(message)
+        return route['coin'] if route['intent'] == 'price' else None
     
     def is_crypto_related(self, message):
         """Check if the message is cryptocurrency-related"""
-        crypto_keywords = [
-            'bitcoin', 'btc', 'ethereum', 'eth', 'crypto', 'cryptocurrency',
-            'blockchain', 'cardano', 'ada', 'solana', 'sol', 'investment',
-            'trading', 'market', 'price', 'buy', 'sell', 'wallet'
-        ]
-        
-        return any(keyword in message.lower() for keyword in crypto_keywords)
+        return self.router.route(message)['crypto_related']
     
-    def get_response(self, message):
-        """Get response from the chatbot with enhanced crypto logic"""
-        
+    def get_response(self, message, conversation=None):
+        """Get response from the chatbot with enhanced crypto logic
+
+        ``conversation`` tags what ChatterBot learns with a per-session ID,
+        so concurrent server sessions don't share reply history. Each turn is
+        timed into the metrics registry, per intent and per stage.
+        """
+        start = time.perf_counter()
+        with METRICS.timer(CHAT_STAGE_SECONDS, stage='route'):
+            route = self.router.route(message)
+
+        try:
+            return self._respond(message, route, conversation)
+        finally:
+            METRICS.observe(CHAT_SECONDS, time.perf_counter() - start, intent=route['intent'])
+
+    def _respond(self, message, route, conversation):
         # Check for crypto price queries first
-        crypto_name = self.is_crypto_price_query(message)
-        if crypto_name:
-            price_data = self.get_crypto_price(crypto_name)
+        if route['intent'] == 'price':
+            crypto_name = route['coin']
+            with METRICS.timer(CHAT_STAGE_SECONDS, stage='price'):
+                price_data = self.get_crypto_price(crypto_name)
             if price_data:
                 return f"💰 {crypto_name.upper()} is currently trading at {price_data['formatted_price']} (24h change: {price_data['formatted_change']}). Remember, crypto prices are highly volatile!"
             else:
                 return f"I couldn't fetch the current price for {crypto_name}. Please check the spelling or try a different cryptocurrency."
         
-        # If-else logic for specific crypto queries
-        message_lower = message.lower()
-        
-        if 'sustainable' in message_lower or 'eco' in message_lower or 'green' in message_lower:
-            return "🌱 The most sustainable cryptocurrencies are those using Proof of Stake consensus like Cardano (ADA), Ethereum 2.0, and Solana. They use 99% less energy than Bitcoin!"
-        
-        elif 'risky' in message_lower or 'risk' in message_lower:
-            return "⚠️ Cryptocurrency investments are extremely risky! Prices can fluctuate wildly, you could lose everything, and the market is largely unregulated. Never invest more than you can afford to lose!"
-        
-        elif 'best crypto' in message_lower or 'which crypto' in message_lower:
-            return "🎯 I can't recommend specific investments, but consider factors like: technology, team, use case, market cap, and sustainability. Popular options include Bitcoin (store of value), Ethereum (smart contracts), and Cardano (sustainability). Always do your own research!"
-        
-        elif 'defi' in message_lower:
-            return "🏦 DeFi (Decentralized Finance) refers to financial services built on blockchain technology, eliminating traditional intermediaries like banks. Examples include lending, borrowing, and trading on platforms like Uniswap and Compound."
-        
-        elif 'nft' in message_lower:
-            return "🎨 NFTs (Non-Fungible Tokens) are unique digital assets stored on blockchain. They can represent art, collectibles, or other digital items. The market is highly speculative and volatile."
+        # Canned answers for specific crypto queries
+        if route['intent'] in RULE_RESPONSES:
+            return RULE_RESPONSES[route['intent']]
         
         # Use ChatterBot for general conversation
-        response = self.chatbot.get_response(message)
+        with METRICS.timer(CHAT_STAGE_SECONDS, stage='chatterbot'):
+            if conversation is None:
+                response = self.chatbot.get_response(message)
+            else:
+                response = self.chatbot.get_response(message, conversation=conversation)
+        with METRICS.timer(CHAT_STAGE_SECONDS, stage='index'):
+            self._index_learned_statement(message)
         
         # Add crypto disclaimer for crypto-related queries
-        if self.is_crypto_related(message):
+        if route['crypto_related']:
             return f"{response}\n\n⚠️ Remember: Cryptocurrency investments are high-risk. Always do your own research!"
         
         return str(response)
 
 def main():
     """Main function to run the CryptoBud chatbot"""
+    parser = argparse.ArgumentParser(description="CryptoBud chatbot")
+    parser.add_argument('--database', default=DEFAULT_DATABASE_PATH, help="SQLite database to train into and learn from")
+    parser.add_argument('--prebuilt', help="Open a baked database read-only instead of training")
+    parser.add_argument('--retrain', action='store_true', help="Retrain even if the training snapshot is current")
+    parser.add_argument('--bake', metavar='PATH', help="Bake a read-only prebuilt database to PATH and exit")
+    parser.add_argument('--vector-index', action='store_true', help="Use the TF-IDF statement index for fallback lookups")
+    parser.add_argument('--fast-start', action='store_true', help="Answer straight away and load ChatterBot in the background")
+    parser.add_argument('--storage', choices=STORAGE_MODES, default='sync',
+                        help="Learn synchronously, through a batched background writer, or not at all as a read-only replica")
+    args = parser.parse_args()
+
+    if args.bake:
+        print(f"Baking prebuilt database to {bake_prebuilt_database(args.bake)}")
+        return
+
     print("🚀 CryptoBud - Proprietary Cryptocurrency Intelligence Platform")
     print("=" * 60)
     print("Welcome! I'm your AI crypto assistant with real-time data.")
     print("Ask me about prices, sustainability, or general crypto questions.")
     print("Type 'quit' to exit.\n")
     
-    bot = CryptoBudBot()
+    bot = CryptoBudBot(database_path=args.database, prebuilt_database=args.prebuilt, retrain=args.retrain,
+                       vector_index=args.vector_index, lazy=args.fast_start, warm=args.fast_start,
+                       storage_mode=args.storage)
     
     while True:
         try:
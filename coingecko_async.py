@@ -0,0 +1,104 @@
+"""
+CryptoBud Async CoinGecko Client
+Pooled aiohttp client with bounded concurrency for fanning out API calls
+"""
+
+import asyncio
+
+from metrics import METRICS, UPSTREAM_ERRORS, UPSTREAM_SECONDS
+from rate_limit import COINGECKO_LIMITER
+
+COINGECKO_API = "https://api.coingecko.com/api/v3"
+
+
+def endpoint_name(path):
+    """Metric label for an API path, with the coin ID replaced: /coins/{id}/market_chart"""
+    parts = path.split('/')
+    if len(parts) > 2 and parts[1] == 'coins' and parts[2] not in ('markets', 'list'):
+        # Keep label cardinality bounded whatever the coin ID contains
+        return '/coins/{id}' + (f"/{parts[-1]}" if len(parts) > 3 else '')
+    return path
+
+
+class AsyncCoinGeckoClient:
+    def __init__(self, base_url=COINGECKO_API, max_concurrency=8, max_connections=32, timeout=10, rate_limiter=None):
+        """Configure the client; the connection pool is opened by start()
+
+        Calls go through ``rate_limiter`` (the shared CoinGecko limiter by
+        default), which spaces them out and retries transient failures.
+        """
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter if rate_limiter is not None else COINGECKO_LIMITER
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.session = None
+        self._semaphore = None
+
+    async def start(self):
+        """Open the pooled HTTP session"""
+        if self.session is None:
+            # Imported here: sync-only callers such as the chatbot skip aiohttp's import cost
+            import aiohttp
+
+            # Created here so they bind to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self
+
+    async def close(self):
+        """Close the HTTP session and its pooled connections"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def get_json(self, path, params=None):
+        """GET an API path and decode the JSON body"""
+        return await self.rate_limiter.call_async(self._get_json_once, path, params)
+
+    async def _get_json_once(self, path, params):
+        async with self._semaphore:
+            with METRICS.timer(UPSTREAM_SECONDS, error_counter=UPSTREAM_ERRORS, endpoint=endpoint_name(path)):
+                async with self.session.get(f"{self.base_url}{path}", params=params) as response:
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+
+    async def get_series(self, path, params=None, series='prices'):
+        """GET a market_chart path and stream one series into arrays
+
+        Returns (timestamps, values) like ``parse_market_chart``; the rest of
+        the body is never decoded.
+        """
+        return await self.rate_limiter.call_async(self._get_series_once, path, params, series)
+
+    async def _get_series_once(self, path, params, series):
+        # Imported here: the parser pulls in NumPy, which the chatbot never needs
+        from chart_parser import CHUNK_SIZE, DRAIN_LIMIT, MarketChartParser
+
+        async with self._semaphore:
+            with METRICS.timer(UPSTREAM_SECONDS, error_counter=UPSTREAM_ERRORS, endpoint=endpoint_name(path)):
+                async with self.session.get(f"{self.base_url}{path}", params=params) as response:
+                    response.raise_for_status()
+                    parser = MarketChartParser(series)
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        if parser.feed(chunk):
+                            break
+
+                    # Finish a short body so the connection goes back to the
+                    # pool; releasing a longer one unread closes it instead
+                    drained = 0
+                    while drained <= DRAIN_LIMIT:
+                        chunk = await response.content.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        drained += len(chunk)
+                    return parser.result()
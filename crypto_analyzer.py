@@ -5,14 +5,234 @@ Proprietary cryptocurrency analysis with if-else decision logic
 """
 
 import requests
+import asyncio
 import json
+import math
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-import statistics
+import numpy as np
+from chart_parser import CHUNK_SIZE, parse_market_chart, parse_market_chart_series
+from coingecko_async import AsyncCoinGeckoClient, COINGECKO_API, endpoint_name
+from market_store import DAY_MS, GRANULARITY_MS
+from metrics import METRICS, ANALYZER_STEP_SECONDS, UPSTREAM_ERRORS, UPSTREAM_SECONDS, watch_cache
+from rate_limit import COINGECKO_LIMITER
+from request_memo import RequestMemo
+from ttl_cache import TTLCache
+
+# Classification thresholds; a value strictly above a threshold moves up a label
+TREND_THRESHOLDS = np.array([-10.0, -3.0, 3.0, 10.0])
+TREND_LABELS = np.array(['strongly_bearish', 'bearish', 'sideways', 'bullish', 'strongly_bullish'])
+RISK_THRESHOLDS = np.array([5.0, 10.0, 15.0])
+RISK_LABELS = np.array(['low', 'medium', 'high', 'very_high'])
+
+# Recommendation points as lookup tables, mirroring _build_recommendation.
+# Market cap rank: top 10, top 50, top 100, everything else
+RANK_THRESHOLDS = np.array([10, 50, 100])
+RANK_POINTS = np.array([3, 2, 1, -1])
+# Indexed like TREND_LABELS and RISK_LABELS
+TREND_POINTS = np.array([-2, -1, 0, 1, 2])
+RISK_POINTS = np.array([1, 0, -1, -2])
+# A score at or above a threshold moves up a label
+RECOMMENDATION_THRESHOLDS = np.array([-2, 0, 2, 4])
+RECOMMENDATION_LABELS = np.array(['STRONG SELL', 'WEAK SELL', 'HOLD/NEUTRAL', 'BUY', 'STRONG BUY'])
+
+# /coins/markets returns at most this many coins per page
+MARKETS_PAGE_SIZE = 250
+
+# Windows in days for a dashboard-style multi-timeframe view
+DEFAULT_TIMEFRAMES = (1, 7, 30, 90)
+
+
+def classify_trend(change_percent):
+    """Map percent change (scalar or array) to trend labels"""
+    return TREND_LABELS[np.searchsorted(TREND_THRESHOLDS, change_percent, side='left')]
+
+
+def classify_risk(volatility):
+    """Map mean absolute percent change (scalar or array) to risk levels"""
+    return RISK_LABELS[np.searchsorted(RISK_THRESHOLDS, volatility, side='left')]
+
+
+def analyze_price_arrays(prices):
+    """Vectorized trend and volatility analysis over a 2-D batch of price series
+
+    Each row is one coin. Rows of different lengths can be padded with NaN at
+    either end. Prices that aren't positive are treated as missing, since
+    changes are relative to them. Returns a dict of per-row arrays; ``valid``
+    is False for rows without two neighbouring usable prices.
+    """
+    batch = np.atleast_2d(np.asarray(prices, dtype=float))
+    batch = np.where(batch > 0, batch, np.nan)
+    n_rows, n_points = batch.shape
+
+    if n_points < 2:
+        empty = np.full(n_rows, np.nan)
+        return {
+            'valid': np.zeros(n_rows, dtype=bool),
+            'change_percent': empty,
+            'volatility': empty.copy(),
+            'start_price': empty.copy(),
+            'end_price': empty.copy(),
+            'trend': classify_trend(np.zeros(n_rows)),
+            'risk_level': classify_risk(np.zeros(n_rows))
+        }
+
+    present = ~np.isnan(batch)
+    rows = np.arange(n_rows)
+    start_price = batch[rows, present.argmax(axis=1)]
+    end_price = batch[rows, n_points - 1 - present[:, ::-1].argmax(axis=1)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_percent = (end_price - start_price) / start_price * 100
+        abs_changes = np.abs(np.diff(batch, axis=1) / batch[:, :-1]) * 100
+
+    # Mean absolute change, ignoring steps that touch padding
+    has_change = ~np.isnan(abs_changes)
+    n_changes = has_change.sum(axis=1)
+    total_change = np.where(has_change, abs_changes, 0.0).sum(axis=1)
+    volatility = np.where(n_changes > 0, total_change / np.maximum(n_changes, 1), 0.0)
+
+    return {
+        'valid': (n_changes > 0) & np.isfinite(change_percent) & np.isfinite(volatility),
+        'change_percent': change_percent,
+        'volatility': volatility,
+        'start_price': start_price,
+        'end_price': end_price,
+        'trend': classify_trend(np.nan_to_num(change_percent)),
+        'risk_level': classify_risk(volatility)
+    }
+
+
+def analyze_price_series(prices):
+    """Analyze one price series (1-D) or a batch of series (2-D)
+
+    Returns the same dict as ``CryptoAnalyzer.analyze_price_trend`` for a
+    single series, or a list of them for a batch. Series with fewer than two
+    prices give "insufficient_data".
+    """
+    series = np.asarray(prices, dtype=float)
+    arrays = analyze_price_arrays(series)
+
+    results = []
+    for i in range(len(arrays['valid'])):
+        if not arrays['valid'][i]:
+            results.append("insufficient_data")
+            continue
+
+        results.append({
+            'trend': str(arrays['trend'][i]),
+            'change_percent': round(float(arrays['change_percent'][i]), 2),
+            'volatility': round(float(arrays['volatility'][i]), 2),
+            'risk_level': str(arrays['risk_level'][i]),
+            'start_price': round(float(arrays['start_price'][i]), 2),
+            'end_price': round(float(arrays['end_price'][i]), 2)
+        })
+
+    return results[0] if series.ndim == 1 else results
+
+
+def resample_closes(timestamps, prices, step_ms):
+    """Downsample a sorted series to the last price in each ``step_ms`` bucket"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not len(timestamps):
+        return timestamps, np.asarray(prices, dtype=float)
+
+    buckets = timestamps // step_ms
+    last = np.flatnonzero(np.append(buckets[1:] != buckets[:-1], True))
+    return timestamps[last], np.asarray(prices, dtype=float)[last]
+
+
+def analyze_timeframe_series(timestamps, prices, timeframes=DEFAULT_TIMEFRAMES, granularity=None):
+    """Analyze several trailing windows of one sorted price series in one pass
+
+    Each window of ``timeframes`` (in days) ends at the last point. With a
+    ``granularity`` ('5m', 'hourly' or 'daily') every window is first
+    resampled to closes of that bar size, so volatility is comparable across
+    windows; otherwise the series' own spacing is kept. Returns
+    {'<days>d': analysis} with the same analyses as ``analyze_price_series``.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    prices = np.asarray(prices, dtype=float)
+    if granularity is not None:
+        timestamps, prices = resample_closes(timestamps, prices, GRANULARITY_MS[granularity])
+
+    timeframes = list(timeframes)
+    if not len(timestamps):
+        return {f"{days}d": "insufficient_data" for days in timeframes}
+
+    # Windows share their end, so they stack right-aligned with NaN padding
+    starts = np.searchsorted(timestamps, timestamps[-1] - np.asarray(timeframes, dtype=float) * DAY_MS, side='left')
+    batch = np.full((len(timeframes), len(prices) - starts.min()), np.nan)
+    for row, start in enumerate(starts):
+        batch[row, batch.shape[1] - (len(prices) - start):] = prices[start:]
+
+    analyses = analyze_price_series(batch)
+    return {f"{days}d": analysis for days, analysis in zip(timeframes, analyses)}
+
+
+def score_market_arrays(ranks, prices, sustainability):
+    """Score a batch of coins in one vectorized pass
+
+    ``ranks`` holds market cap ranks (NaN when unranked), ``prices`` a 2-D
+    NaN-padded batch of recent price series and ``sustainability`` the
+    sustainability scores. Applies the same rules as
+    ``CryptoAnalyzer._build_recommendation`` and returns a dict of per-coin
+    arrays, with the trend analysis from ``analyze_price_arrays``.
+    """
+    ranks = np.nan_to_num(np.asarray(ranks, dtype=float), nan=999)
+    sustainability = np.asarray(sustainability, dtype=float)
+    arrays = analyze_price_arrays(prices)
+
+    trend_index = np.searchsorted(TREND_THRESHOLDS, np.nan_to_num(arrays['change_percent']), side='left')
+    risk_index = np.searchsorted(RISK_THRESHOLDS, arrays['volatility'], side='left')
+
+    score = (
+        RANK_POINTS[np.searchsorted(RANK_THRESHOLDS, ranks, side='left')] +
+        TREND_POINTS[trend_index] +
+        RISK_POINTS[risk_index] +
+        (sustainability >= 8).astype(int) - (sustainability <= 3).astype(int)
+    )
+
+    arrays['score'] = score
+    arrays['recommendation'] = RECOMMENDATION_LABELS[np.searchsorted(RECOMMENDATION_THRESHOLDS, score, side='right')]
+    return arrays
+
+
+def _cache_key(path, params):
+    return (path, tuple(sorted((params or {}).items())))
+
+
+def _series_key(path, params):
+    """Cache key for the parsed price series of a market_chart request"""
+    return _cache_key(path, params) + ('prices',)
+
+
+def _frozen(series):
+    """Make cached arrays read-only, so no caller can change them for the others"""
+    for column in series:
+        column.flags.writeable = False
+    return series
+
 
 class CryptoAnalyzer:
-    def __init__(self):
-        """Initialize the crypto analyzer with API endpoints"""
-        self.coingecko_api = "https://api.coingecko.com/api/v3"
+    def __init__(self, coingecko_api=COINGECKO_API, history_store=None, offline=False, rate_limiter=None, market_cache=None):
+        """Initialize the crypto analyzer with API endpoints
+
+        With a ``history_store`` (a MarketHistoryStore), price history is read
+        from disk and only the missing tail is fetched. ``offline`` analyzes
+        whatever is stored without calling the API.
+
+        API calls go through ``rate_limiter`` (the shared CoinGecko limiter by
+        default). Responses are kept in ``market_cache``, a TTLCache that a
+        PrefetchScheduler can keep warm.
+        """
+        self.coingecko_api = coingecko_api
+        self.session = requests.Session()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else COINGECKO_LIMITER
+        self.market_cache = market_cache if market_cache is not None else TTLCache(ttl=120, stale_ttl=600, negative_ttl=0)
+        watch_cache('market', self.market_cache)
+        self.history_store = history_store
+        self.offline = offline
         self.sustainability_scores = {
             'bitcoin': {'score': 3, 'energy_per_tx': '741 kWh', 'consensus': 'Proof of Work'},
             'ethereum': {'score': 8, 'energy_per_tx': '0.0026 kWh', 'consensus': 'Proof of Stake'},
@@ -21,200 +241,621 @@ class CryptoAnalyzer:
             'polkadot': {'score': 8, 'energy_per_tx': '0.0017 kWh', 'consensus': 'Nominated Proof of Stake'},
             'polygon': {'score': 8, 'energy_per_tx': '0.00079 kWh', 'consensus': 'Proof of Stake'}
         }
+
+    def _get_json(self, path, params=None, cached=True):
+        """GET an API path, served from the market cache when possible"""
+        if not cached:
+            return self._fetch_json(path, params)
+
+        key = _cache_key(path, params)
+        return self.market_cache.get(key, lambda keys: {key: self._fetch_json(path, params)})
+
+    def _fetch_json(self, path, params=None):
+        """GET an API path over the pooled session and decode the JSON body"""
+        def request():
+            with METRICS.timer(UPSTREAM_SECONDS, error_counter=UPSTREAM_ERRORS, endpoint=endpoint_name(path)):
+                response = self.session.get(f"{self.coingecko_api}{path}", params=params, timeout=10)
+                response.raise_for_status()
+                return response.json()
+
+        return self.rate_limiter.call(request)
+
+    async def _get_json_async(self, client, path, params=None, cached=True):
+        """Async variant of _get_json; stale entries are served while they revalidate"""
+        if not cached:
+            return await client.get_json(path, params)
+
+        return await self.market_cache.get_async(_cache_key(path, params), lambda: client.get_json(path, params))
+
+    def _get_series(self, path, params=None, cached=True):
+        """(timestamps, prices) of a market_chart path, served from the market cache when possible"""
+        if not cached:
+            return self._fetch_series(path, params)
+
+        key = _series_key(path, params)
+        return self.market_cache.get(key, lambda keys: {key: _frozen(self._fetch_series(path, params))})
+
+    def _fetch_series(self, path, params=None, series=None):
+        """Stream a market_chart body and parse only its prices
+
+        The body is never decoded as a whole: the prices land straight in
+        compact arrays and market_caps and total_volumes are skipped. With a
+        tuple of ``series`` names, returns {name: (timestamps, values) or
+        None} for each of them instead.
+        """
+        def request():
+            with METRICS.timer(UPSTREAM_SECONDS, error_counter=UPSTREAM_ERRORS, endpoint=endpoint_name(path)):
+                with self.session.get(f"{self.coingecko_api}{path}", params=params, timeout=10, stream=True) as response:
+                    response.raise_for_status()
+                    chunks = response.iter_content(CHUNK_SIZE)
+                    if series is None:
+                        return parse_market_chart(chunks)
+                    return parse_market_chart_series(chunks, series)
+
+        return self.rate_limiter.call(request)
+
+    async def _get_series_async(self, client, path, params=None, cached=True):
+        """Async variant of _get_series"""
+        if not cached:
+            return await client.get_series(path, params)
+
+        async def load():
+            return _frozen(await client.get_series(path, params))
+
+        return await self.market_cache.get_async(_series_key(path, params), load)
+
+    def _get_price_history(self, crypto_id, days):
+        """Return the price series for the last ``days`` days"""
+        path = f"/coins/{crypto_id}/market_chart"
+
+        if self.history_store is None:
+            return self._get_series(path, {'vs_currency': 'usd', 'days': days})[1]
+
+        return self._get_stored_series(crypto_id, days)[1]
+
+    def _get_price_series(self, crypto_id, days):
+        """Return (timestamps, prices) for the last ``days`` days"""
+        if self.history_store is None:
+            return self._get_series(f"/coins/{crypto_id}/market_chart", {'vs_currency': 'usd', 'days': days})
+        return self._get_stored_series(crypto_id, days)
+
+    def _get_stored_series(self, crypto_id, days):
+        """Top up the history store's window for ``days`` and read it back"""
+        path = f"/coins/{crypto_id}/market_chart"
+
+        if not self.offline:
+            plan = self.history_store.plan_fetch(crypto_id, days)
+            if plan:
+                timestamps, prices = self._get_series(path, plan['params'], cached=False)
+                self.history_store.merge(crypto_id, days, timestamps, prices, replace=plan['replace'], since=plan['since'])
+
+        return self.history_store.read_window(crypto_id, days)
+
+    async def _get_price_history_async(self, crypto_id, days, client):
+        """Async variant of _get_price_history"""
+        path = f"/coins/{crypto_id}/market_chart"
+
+        if self.history_store is None:
+            return (await self._get_series_async(client, path, {'vs_currency': 'usd', 'days': days}))[1]
+
+        return (await self._get_stored_series_async(crypto_id, days, client))[1]
+
+    async def _get_price_series_async(self, crypto_id, days, client):
+        """Async variant of _get_price_series"""
+        if self.history_store is None:
+            return await self._get_series_async(client, f"/coins/{crypto_id}/market_chart", {'vs_currency': 'usd', 'days': days})
+        return await self._get_stored_series_async(crypto_id, days, client)
+
+    async def _get_stored_series_async(self, crypto_id, days, client):
+        """Async variant of _get_stored_series"""
+        path = f"/coins/{crypto_id}/market_chart"
+
+        if not self.offline:
+            plan = self.history_store.plan_fetch(crypto_id, days)
+            if plan:
+                timestamps, prices = await self._get_series_async(client, path, plan['params'], cached=False)
+                self.history_store.merge(crypto_id, days, timestamps, prices, replace=plan['replace'], since=plan['since'])
+
+        return self.history_store.read_window(crypto_id, days)
     
+    def prefetch(self, crypto_id, days=7):
+        """Refresh the market data a recommendation for ``crypto_id`` reads"""
+        path = f"/coins/{crypto_id}"
+        self.market_cache.put_many({_cache_key(path, None): self._fetch_json(path)})
+
+        if self.history_store is None:
+            chart_path = f"/coins/{crypto_id}/market_chart"
+            params = {'vs_currency': 'usd', 'days': days}
+            self.market_cache.put_many({_series_key(chart_path, params): _frozen(self._fetch_series(chart_path, params))})
+        elif not self.offline:
+            # Tops up the on-disk history
+            self._get_price_history(crypto_id, days)
+
+    def get_market_history(self, crypto_id, days=365, interval=None):
+        """Return (timestamps, prices, market_caps) for the last ``days`` days
+
+        Timestamps are int64 milliseconds; market_caps is None when CoinGecko
+        doesn't send one per price. Meant for bulk reads such as backtests:
+        the body is streamed into arrays and bypasses the market cache, so
+        long histories don't evict the entries live requests read. Upstream
+        errors are raised.
+        """
+        params = {'vs_currency': 'usd', 'days': days}
+        if interval is not None:
+            params['interval'] = interval
+        chart = self._fetch_series(f"/coins/{crypto_id}/market_chart", params, series=('prices', 'market_caps'))
+
+        if chart['prices'] is None:
+            raise ValueError(f"market_chart for {crypto_id} has no prices")
+        timestamps, prices = chart['prices']
+        caps = chart['market_caps']
+        return timestamps, prices, caps[1] if caps is not None and len(caps[1]) == len(prices) else None
+
     def analyze_price_trend(self, crypto_id, days=7):
         """Analyze price trend using if-else logic"""
         try:
-            url = f"{self.coingecko_api}/coins/{crypto_id}/market_chart"
-            params = {'vs_currency': 'usd', 'days': days}
-            
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
-            
-            prices = [price[1] for price in data['prices']]
-            
-            if len(prices) < 2:
-                return "insufficient_data"
-            
-            # Calculate trend using if-else logic
-            start_price = prices[0]
-            end_price = prices[-1]
-            change_percent = ((end_price - start_price) / start_price) * 100
-            
-            # Volatility analysis
-            price_changes = []
-            for i in range(1, len(prices)):
-                change = ((prices[i] - prices[i-1]) / prices[i-1]) * 100
-                price_changes.append(abs(change))
-            
-            volatility = statistics.mean(price_changes) if price_changes else 0
-            
-            # If-else decision logic for trend classification
-            if change_percent > 10:
-                trend = "strongly_bullish"
-            elif change_percent > 3:
-                trend = "bullish"
-            elif change_percent > -3:
-                trend = "sideways"
-            elif change_percent > -10:
-                trend = "bearish"
-            else:
-                trend = "strongly_bearish"
-            
-            # Risk assessment using if-else logic
-            if volatility > 15:
-                risk_level = "very_high"
-            elif volatility > 10:
-                risk_level = "high"
-            elif volatility > 5:
-                risk_level = "medium"
-            else:
-                risk_level = "low"
-            
-            return {
-                'trend': trend,
-                'change_percent': round(change_percent, 2),
-                'volatility': round(volatility, 2),
-                'risk_level': risk_level,
-                'start_price': round(start_price, 2),
-                'end_price': round(end_price, 2)
-            }
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='price_history'):
+                prices = self._get_price_history(crypto_id, days)
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='trend'):
+                return analyze_price_series(prices)
             
         except Exception as e:
             print(f"Error analyzing price trend: {e}")
             return None
     
-    def get_investment_recommendation(self, crypto_id):
-        """Generate investment recommendation using if-else decision logic"""
+    def analyze_timeframes(self, crypto_id, timeframes=DEFAULT_TIMEFRAMES, granularity=None):
+        """Analyze several timeframes of one coin from a single history fetch
+
+        Only the longest window is downloaded; every shorter one is sliced
+        from it in memory. Shorter windows therefore get the longer window's
+        spacing (hourly for up to 90 days, daily beyond) rather than the
+        finer data a separate fetch would return; pass ``granularity`` to
+        resample every window to the same bars.
+        """
+        try:
+            timeframes = sorted(set(timeframes))
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='price_history'):
+                timestamps, prices = self._get_price_series(crypto_id, timeframes[-1])
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='timeframes'):
+                return self._build_timeframes(crypto_id, timestamps, prices, timeframes, granularity)
+
+        except Exception as e:
+            print(f"Error analyzing timeframes: {e}")
+            return None
+
+    def _build_timeframes(self, crypto_id, timestamps, prices, timeframes, granularity):
+        return {
+            'crypto_id': crypto_id,
+            'fetched_days': timeframes[-1],
+            'points': len(prices),
+            'granularity': granularity,
+            'timeframes': analyze_timeframe_series(timestamps, prices, timeframes, granularity)
+        }
+
+    def _memoized(self, memo, key, loader):
+        """``loader()``, computed once per memo when there is one"""
+        return loader() if memo is None else memo.get(key, loader)
+
+    async def _memoized_async(self, memo, key, loader):
+        """Async variant of _memoized; ``loader`` returns an awaitable"""
+        return await (loader() if memo is None else memo.get_async(key, loader))
+
+    def get_investment_recommendation(self, crypto_id, memo=None):
+        """Generate investment recommendation using if-else decision logic
+
+        With a RequestMemo, the market data and trend analysis behind the
+        recommendation are fetched once per memo, however many callers ask.
+        """
         try:
             # Get current market data
-            url = f"{self.coingecko_api}/coins/{crypto_id}"
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            
-            # Extract key metrics
-            market_cap_rank = data.get('market_cap_rank', 999)
-            price_change_24h = data['market_data']['price_change_percentage_24h']
-            price_change_7d = data['market_data']['price_change_percentage_7d']
-            price_change_30d = data['market_data']['price_change_percentage_30d']
-            market_cap = data['market_data']['market_cap']['usd']
+            data = self._memoized(memo, ('market_data', crypto_id), lambda: self._get_json(f"/coins/{crypto_id}"))
             
             # Get trend analysis
-            trend_analysis = self.analyze_price_trend(crypto_id)
-            
-            if not trend_analysis:
-                return "Unable to analyze - insufficient data"
-            
-            # If-else decision logic for investment recommendation
-            recommendation_score = 0
-            reasons = []
-            
-            # Market cap ranking factor
-            if market_cap_rank <= 10:
-                recommendation_score += 3
-                reasons.append("Top 10 cryptocurrency by market cap")
-            elif market_cap_rank <= 50:
-                recommendation_score += 2
-                reasons.append("Established cryptocurrency (top 50)")
-            elif market_cap_rank <= 100:
-                recommendation_score += 1
-                reasons.append("Mid-cap cryptocurrency")
-            else:
-                recommendation_score -= 1
-                reasons.append("Small-cap cryptocurrency (higher risk)")
+            trend_analysis = self._memoized(memo, ('trend', crypto_id), lambda: self.analyze_price_trend(crypto_id))
             
-            # Price trend factor
-            if trend_analysis['trend'] == "strongly_bullish":
-                recommendation_score += 2
-                reasons.append("Strong upward price momentum")
-            elif trend_analysis['trend'] == "bullish":
-                recommendation_score += 1
-                reasons.append("Positive price trend")
-            elif trend_analysis['trend'] == "strongly_bearish":
-                recommendation_score -= 2
-                reasons.append("Strong downward price trend")
-            elif trend_analysis['trend'] == "bearish":
-                recommendation_score -= 1
-                reasons.append("Negative price trend")
-            
-            # Volatility factor
-            if trend_analysis['risk_level'] == "very_high":
-                recommendation_score -= 2
-                reasons.append("Very high volatility (extreme risk)")
-            elif trend_analysis['risk_level'] == "high":
-                recommendation_score -= 1
-                reasons.append("High volatility")
-            elif trend_analysis['risk_level'] == "low":
-                recommendation_score += 1
-                reasons.append("Low volatility (more stable)")
-            
-            # Sustainability factor
-            sustainability = self.sustainability_scores.get(crypto_id, {'score': 5})
-            if sustainability['score'] >= 8:
-                recommendation_score += 1
-                reasons.append("Highly sustainable (eco-friendly)")
-            elif sustainability['score'] <= 3:
-                recommendation_score -= 1
-                reasons.append("Low sustainability score")
-            
-            # Final recommendation using if-else logic
-            if recommendation_score >= 4:
-                recommendation = "STRONG BUY"
-                risk_warning = "Consider for long-term investment"
-            elif recommendation_score >= 2:
-                recommendation = "BUY"
-                risk_warning = "Good investment potential with moderate risk"
-            elif recommendation_score >= 0:
-                recommendation = "HOLD/NEUTRAL"
-                risk_warning = "Mixed signals - proceed with caution"
-            elif recommendation_score >= -2:
-                recommendation = "WEAK SELL"
-                risk_warning = "High risk - consider reducing position"
-            else:
-                recommendation = "STRONG SELL"
-                risk_warning = "Very high risk - avoid or exit position"
-            
-            return {
-                'recommendation': recommendation,
-                'score': recommendation_score,
-                'reasons': reasons,
-                'risk_warning': risk_warning,
-                'trend_analysis': trend_analysis,
-                'sustainability': sustainability,
-                'market_cap_rank': market_cap_rank
-            }
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='recommendation'):
+                return self._build_recommendation(crypto_id, data, trend_analysis)
             
         except Exception as e:
             print(f"Error generating recommendation: {e}")
             return None
+
+    def _build_recommendation(self, crypto_id, data, trend_analysis):
+        """Score a coin from its /coins/{id} data and trend analysis"""
+        # Extract key metrics
+        market_cap_rank = data.get('market_cap_rank', 999)
+        price_change_24h = data['market_data']['price_change_percentage_24h']
+        price_change_7d = data['market_data']['price_change_percentage_7d']
+        price_change_30d = data['market_data']['price_change_percentage_30d']
+        market_cap = data['market_data']['market_cap']['usd']
+        
+        if not trend_analysis:
+            return "Unable to analyze - insufficient data"
+        
+        # If-else decision logic for investment recommendation
+        recommendation_score = 0
+        reasons = []
+        
+        # Market cap ranking factor
+        if market_cap_rank <= 10:
+            recommendation_score += 3
+            reasons.append("Top 10 cryptocurrency by market cap")
+        elif market_cap_rank <= 50:
+            recommendation_score += 2
+            reasons.append("Established cryptocurrency (top 50)")
+        elif market_cap_rank <= 100:
+            recommendation_score += 1
+            reasons.append("Mid-cap cryptocurrency")
+        else:
+            recommendation_score -= 1
+            reasons.append("Small-cap cryptocurrency (higher risk)")
+        
+        # Price trend factor
+        if trend_analysis['trend'] == "strongly_bullish":
+            recommendation_score += 2
+            reasons.append("Strong upward price momentum")
+        elif trend_analysis['trend'] == "bullish":
+            recommendation_score += 1
+            reasons.append("Positive price trend")
+        elif trend_analysis['trend'] == "strongly_bearish":
+            recommendation_score -= 2
+            reasons.append("Strong downward price trend")
+        elif trend_analysis['trend'] == "bearish":
+            recommendation_score -= 1
+            reasons.append("Negative price trend")
+        
+        # Volatility factor
+        if trend_analysis['risk_level'] == "very_high":
+            recommendation_score -= 2
+            reasons.append("Very high volatility (extreme risk)")
+        elif trend_analysis['risk_level'] == "high":
+            recommendation_score -= 1
+            reasons.append("High volatility")
+        elif trend_analysis['risk_level'] == "low":
+            recommendation_score += 1
+            reasons.append("Low volatility (more stable)")
+        
+        # Sustainability factor
+        sustainability = self.sustainability_scores.get(crypto_id, {'score': 5})
+        if sustainability['score'] >= 8:
+            recommendation_score += 1
+            reasons.append("Highly sustainable (eco-friendly)")
+        elif sustainability['score'] <= 3:
+            recommendation_score -= 1
+            reasons.append("Low sustainability score")
+        
+        # Final recommendation using if-else logic
+        if recommendation_score >= 4:
+            recommendation = "STRONG BUY"
+            risk_warning = "Consider for long-term investment"
+        elif recommendation_score >= 2:
+            recommendation = "BUY"
+            risk_warning = "Good investment potential with moderate risk"
+        elif recommendation_score >= 0:
+            recommendation = "HOLD/NEUTRAL"
+            risk_warning = "Mixed signals - proceed with caution"
+        elif recommendation_score >= -2:
+            recommendation = "WEAK SELL"
+            risk_warning = "High risk - consider reducing position"
+        else:
+            recommendation = "STRONG SELL"
+            risk_warning = "Very high risk - avoid or exit position"
+        
+        return {
+            'recommendation': recommendation,
+            'score': recommendation_score,
+            'reasons': reasons,
+            'risk_warning': risk_warning,
+            'trend_analysis': trend_analysis,
+            'sustainability': sustainability,
+            'market_cap_rank': market_cap_rank
+        }
     
-    def compare_cryptocurrencies(self, crypto1_id, crypto2_id):
-        """Compare two cryptocurrencies using if-else logic"""
+    def _markets_params(self, page, per_page):
+        return {
+            'vs_currency': 'usd',
+            'order': 'market_cap_desc',
+            'per_page': per_page,
+            'page': page,
+            'sparkline': 'true',
+            'price_change_percentage': '24h,7d,30d'
+        }
+
+    def _market_pages(self, limit, per_page):
+        per_page = max(1, min(per_page, MARKETS_PAGE_SIZE))
+        return per_page, math.ceil(limit / per_page)
+
+    def screen_markets(self, limit=500, per_page=MARKETS_PAGE_SIZE):
+        """Rank the top ``limit`` coins by market cap with the recommendation rules
+
+        Makes at most ceil(limit / per_page) /coins/markets requests, using
+        each coin's 7 day sparkline for the trend and volatility, then scores
+        every coin at once. Returns rows sorted best first; coins without
+        enough price data are left out.
+        """
+        try:
+            per_page, pages = self._market_pages(limit, per_page)
+            coins = []
+            for page in range(1, pages + 1):
+                batch = self._get_json('/coins/markets', self._markets_params(page, per_page))
+                coins.extend(batch)
+                if len(batch) < per_page:
+                    break
+
+            return self._build_screen(coins[:limit])
+
+        except Exception as e:
+            print(f"Error screening markets: {e}")
+            return None
+
+    def _build_screen(self, coins):
+        """Score /coins/markets rows and return them as a sorted table"""
+        if not coins:
+            return []
+
+        series = [(coin.get('sparkline_in_7d') or {}).get('price') or [] for coin in coins]
+        prices = np.full((len(coins), max(2, max(len(prices) for prices in series))), np.nan)
+        for i, coin_prices in enumerate(series):
+            prices[i, :len(coin_prices)] = np.array(coin_prices, dtype=float)
+
+        ranks = [coin.get('market_cap_rank') for coin in coins]
+        sustainability = [self.sustainability_scores.get(coin['id'], {'score': 5})['score'] for coin in coins]
+
+        with METRICS.timer(ANALYZER_STEP_SECONDS, step='screen'):
+            arrays = score_market_arrays(np.array(ranks, dtype=float), prices, sustainability)
+
+        rows = []
+        for i in np.flatnonzero(arrays['valid']):
+            coin = coins[i]
+            rows.append({
+                'id': coin['id'],
+                'symbol': coin.get('symbol'),
+                'name': coin.get('name'),
+                'market_cap_rank': ranks[i] if ranks[i] is not None else 999,
+                'price': coin.get('current_price'),
+                'change_24h': coin.get('price_change_percentage_24h_in_currency', coin.get('price_change_percentage_24h')),
+                'change_7d': coin.get('price_change_percentage_7d_in_currency'),
+                'change_30d': coin.get('price_change_percentage_30d_in_currency'),
+                'trend': str(arrays['trend'][i]),
+                'change_percent': round(float(arrays['change_percent'][i]), 2),
+                'volatility': round(float(arrays['volatility'][i]), 2),
+                'risk_level': str(arrays['risk_level'][i]),
+                'sustainability_score': sustainability[i],
+                'score': int(arrays['score'][i]),
+                'recommendation': str(arrays['recommendation'][i])
+            })
+
+        rows.sort(key=lambda row: (-row['score'], row['market_cap_rank']))
+        return rows
+
+    def compare_cryptocurrencies(self, crypto1_id, crypto2_id, memo=None):
+        """Compare two cryptocurrencies using if-else logic
+
+        Comparisons sharing a RequestMemo analyze each coin only once.
+        """
         try:
-            rec1 = self.get_investment_recommendation(crypto1_id)
-            rec2 = self.get_investment_recommendation(crypto2_id)
+            rec1 = self._recommendation(crypto1_id, memo)
+            rec2 = self._recommendation(crypto2_id, memo)
             
-            if not rec1 or not rec2:
-                return "Unable to compare - insufficient data"
+            return self._build_comparison(crypto1_id, rec1, crypto2_id, rec2)
             
-            comparison = {
-                'crypto1': {'id': crypto1_id, 'data': rec1},
-                'crypto2': {'id': crypto2_id, 'data': rec2}
+        except Exception as e:
+            print(f"Error comparing cryptocurrencies: {e}")
+            return None
+
+    def _recommendation(self, crypto_id, memo):
+        return self._memoized(memo, ('recommendation', crypto_id), lambda: self.get_investment_recommendation(crypto_id, memo))
+
+    def compare_many(self, crypto_ids, memo=None):
+        """Rank any number of coins and compare every pair
+
+        Each distinct coin is analyzed once, through ``memo`` or a fresh
+        RequestMemo, so N coins cost N analyses rather than one per pair.
+        Returns the ranking, a pairwise matrix of score differences (row minus
+        column, so positive means the row coin wins) and the coins that could
+        not be analyzed.
+        """
+        try:
+            memo = memo if memo is not None else RequestMemo()
+            coins = list(dict.fromkeys(crypto_ids))
+            recommendations = {coin: self._recommendation(coin, memo) for coin in coins}
+
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='comparison'):
+                return self._build_comparison_matrix(coins, recommendations)
+
+        except Exception as e:
+            print(f"Error comparing cryptocurrencies: {e}")
+            return None
+
+    def _build_comparison_matrix(self, coins, recommendations):
+        """Rank recommendations and tabulate every pairwise score difference"""
+        # A recommendation that failed is None or a message string
+        compared = [coin for coin in coins if isinstance(recommendations[coin], dict)]
+        if len(compared) < 2:
+            return "Unable to compare - insufficient data"
+
+        scores = np.array([recommendations[coin]['score'] for coin in compared])
+        differences = scores[:, None] - scores[None, :]
+        wins = (differences > 0).sum(axis=1)
+        losses = (differences < 0).sum(axis=1)
+        ties = (differences == 0).sum(axis=1) - 1  # not against itself
+
+        ranks = [recommendations[coin].get('market_cap_rank') or 999 for coin in compared]
+        order = sorted(range(len(compared)), key=lambda i: (-scores[i], ranks[i]))
+        ranking = [
+            {
+                'rank': position,
+                'id': compared[i],
+                'score': int(scores[i]),
+                'recommendation': recommendations[compared[i]]['recommendation'],
+                'wins': int(wins[i]),
+                'losses': int(losses[i]),
+                'ties': int(ties[i])
             }
-            
-            # Determine winner using if-else logic
-            if rec1['score'] > rec2['score']:
-                comparison['winner'] = crypto1_id
-                comparison['reason'] = f"{crypto1_id} has a higher recommendation score ({rec1['score']} vs {rec2['score']})"
-            elif rec2['score'] > rec1['score']:
-                comparison['winner'] = crypto2_id
-                comparison['reason'] = f"{crypto2_id} has a higher recommendation score ({rec2['score']} vs {rec1['score']})"
-            else:
-                comparison['winner'] = "tie"
-                comparison['reason'] = "Both cryptocurrencies have similar recommendation scores"
-            
-            return comparison
-            
+            for position, i in enumerate(order, 1)
+        ]
+
+        leader, runner_up = ranking[0], ranking[1]
+        if leader['score'] > runner_up['score']:
+            winner = leader['id']
+            reason = f"{leader['id']} has the highest recommendation score ({leader['score']} vs {runner_up['score']} for {runner_up['id']})"
+        else:
+            winner = "tie"
+            reason = f"Several cryptocurrencies share the highest recommendation score ({leader['score']})"
+
+        return {
+            'ranking': ranking,
+            'matrix': {
+                row_coin: {column_coin: int(differences[row, column]) for column, column_coin in enumerate(compared)}
+                for row, row_coin in enumerate(compared)
+            },
+            'winner': winner,
+            'reason': reason,
+            'recommendations': {coin: recommendations[coin] for coin in compared},
+            'unavailable': [coin for coin in coins if coin not in compared]
+        }
+
+    def _build_comparison(self, crypto1_id, rec1, crypto2_id, rec2):
+        """Pick a winner between two recommendations"""
+        if not rec1 or not rec2:
+            return "Unable to compare - insufficient data"
+        
+        comparison = {
+            'crypto1': {'id': crypto1_id, 'data': rec1},
+            'crypto2': {'id': crypto2_id, 'data': rec2}
+        }
+        
+        # Determine winner using if-else logic
+        if rec1['score'] > rec2['score']:
+            comparison['winner'] = crypto1_id
+            comparison['reason'] = f"{crypto1_id} has a higher recommendation score ({rec1['score']} vs {rec2['score']})"
+        elif rec2['score'] > rec1['score']:
+            comparison['winner'] = crypto2_id
+            comparison['reason'] = f"{crypto2_id} has a higher recommendation score ({rec2['score']} vs {rec1['score']})"
+        else:
+            comparison['winner'] = "tie"
+            comparison['reason'] = "Both cryptocurrencies have similar recommendation scores"
+        
+        return comparison
+
+    @asynccontextmanager
+    async def _client_scope(self, client):
+        """Use the caller's client, or open a short-lived one"""
+        if client is not None:
+            yield client
+            return
+
+        async with AsyncCoinGeckoClient(self.coingecko_api, rate_limiter=self.rate_limiter) as own_client:
+            try:
+                yield own_client
+            finally:
+                # Stale entries revalidate through this client, so let them finish before it closes
+                await self.market_cache.wait_async()
+
+    async def analyze_price_trend_async(self, crypto_id, days=7, client=None):
+        """Async variant of analyze_price_trend"""
+        try:
+            async with self._client_scope(client) as client:
+                with METRICS.timer(ANALYZER_STEP_SECONDS, step='price_history'):
+                    prices = await self._get_price_history_async(crypto_id, days, client)
+
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='trend'):
+                return analyze_price_series(prices)
+
+        except Exception as e:
+            print(f"Error analyzing price trend: {e}")
+            return None
+
+    async def analyze_timeframes_async(self, crypto_id, timeframes=DEFAULT_TIMEFRAMES, granularity=None, client=None):
+        """Async variant of analyze_timeframes"""
+        try:
+            timeframes = sorted(set(timeframes))
+            async with self._client_scope(client) as client:
+                with METRICS.timer(ANALYZER_STEP_SECONDS, step='price_history'):
+                    timestamps, prices = await self._get_price_series_async(crypto_id, timeframes[-1], client)
+
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='timeframes'):
+                return self._build_timeframes(crypto_id, timestamps, prices, timeframes, granularity)
+
+        except Exception as e:
+            print(f"Error analyzing timeframes: {e}")
+            return None
+
+    async def get_investment_recommendation_async(self, crypto_id, client=None, memo=None):
+        """Async variant of get_investment_recommendation
+
+        Market data and price history are fetched concurrently.
+        """
+        try:
+            async with self._client_scope(client) as client:
+                data, trend_analysis = await asyncio.gather(
+                    self._memoized_async(
+                        memo, ('market_data', crypto_id), lambda: self._get_json_async(client, f"/coins/{crypto_id}")
+                    ),
+                    self._memoized_async(
+                        memo, ('trend', crypto_id), lambda: self.analyze_price_trend_async(crypto_id, client=client)
+                    )
+                )
+
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='recommendation'):
+                return self._build_recommendation(crypto_id, data, trend_analysis)
+
+        except Exception as e:
+            print(f"Error generating recommendation: {e}")
+            return None
+
+    async def screen_markets_async(self, limit=500, per_page=MARKETS_PAGE_SIZE, client=None):
+        """Async variant of screen_markets; all pages are requested concurrently"""
+        try:
+            per_page, pages = self._market_pages(limit, per_page)
+            async with self._client_scope(client) as client:
+                batches = await asyncio.gather(*(
+                    self._get_json_async(client, '/coins/markets', self._markets_params(page, per_page))
+                    for page in range(1, pages + 1)
+                ))
+
+            coins = [coin for batch in batches for coin in batch]
+            return self._build_screen(coins[:limit])
+
+        except Exception as e:
+            print(f"Error screening markets: {e}")
+            return None
+
+    async def compare_cryptocurrencies_async(self, crypto1_id, crypto2_id, client=None, memo=None):
+        """Async variant of compare_cryptocurrencies
+
+        All four upstream calls run concurrently over one connection pool.
+        """
+        try:
+            async with self._client_scope(client) as client:
+                rec1, rec2 = await asyncio.gather(
+                    self._recommendation_async(crypto1_id, client, memo),
+                    self._recommendation_async(crypto2_id, client, memo)
+                )
+
+            return self._build_comparison(crypto1_id, rec1, crypto2_id, rec2)
+
+        except Exception as e:
+            print(f"Error comparing cryptocurrencies: {e}")
+            return None
+
+    async def _recommendation_async(self, crypto_id, client, memo):
+        return await self._memoized_async(
+            memo, ('recommendation', crypto_id),
+            lambda: self.get_investment_recommendation_async(crypto_id, client=client, memo=memo)
+        )
+
+    async def compare_many_async(self, crypto_ids, client=None, memo=None):
+        """Async variant of compare_many; every coin is analyzed concurrently"""
+        try:
+            memo = memo if memo is not None else RequestMemo()
+            coins = list(dict.fromkeys(crypto_ids))
+            async with self._client_scope(client) as client:
+                results = await asyncio.gather(*(self._recommendation_async(coin, client, memo) for coin in coins))
+
+            with METRICS.timer(ANALYZER_STEP_SECONDS, step='comparison'):
+                return self._build_comparison_matrix(coins, dict(zip(coins, results)))
+
         except Exception as e:
             print(f"Error comparing cryptocurrencies: {e}")
             return None
@@ -258,5 +899,14 @@ def main():
         print(f"Winner: {comparison['winner'].upper()}")
         print(f"Reason: {comparison['reason']}")
 
+    # Example market screen
+    print(f"\n🔎 Top 10 of the 250 largest coins:")
+    print("-" * 40)
+
+    screen = analyzer.screen_markets(limit=250)
+    if screen:
+        for row in screen[:10]:
+            print(f"#{row['market_cap_rank']:<4} {row['symbol'].upper():<8} {row['recommendation']:<13} score {row['score']:+d}, {row['trend']}, {row['risk_level']} risk")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
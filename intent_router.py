@@ -0,0 +1,126 @@
+"""
+CryptoBud Intent Router
+Single-pass message classification with one precompiled regular expression
+"""
+
+import re
+
+# Rule-based intents, highest priority first, in the order get_response checks them
+RULE_KEYWORDS = [
+    ('sustainable', ['sustainable', 'eco', 'green']),
+    ('risk', ['risky', 'risk']),
+    ('best_crypto', ['best crypto', 'which crypto']),
+    ('defi', ['defi']),
+    ('nft', ['nft']),
+]
+
+# Keywords that mark a message as crypto-related (adds the risk disclaimer)
+CRYPTO_KEYWORDS = [
+    'bitcoin', 'btc', 'ethereum', 'eth', 'crypto', 'cryptocurrency',
+    'blockchain', 'cardano', 'ada', 'solana', 'sol', 'investment',
+    'trading', 'market', 'price', 'buy', 'sell', 'wallet'
+]
+
+# Price question patterns, highest priority first, as (name, trigger literal,
+# where the coin is). 'current (\w+) price' is left out: whenever it
+# matches, '(\w+) price' matches too and wins.
+PRICE_PATTERNS = [
+    ('price_of', 'price of ', 'after'),      # price of (\w+)
+    ('price_suffix', ' price', 'before'),    # (\w+) price
+    ('how_much', 'how much is ', 'after'),   # how much is (\w+)
+    ('cost_suffix', ' cost', 'before'),      # (\w+) cost
+]
+
+_WORD = re.compile(r'\w+')
+
+
+class IntentRouter:
+    def __init__(self, aliases=None):
+        """Compile the combined matcher
+
+        ``aliases`` maps lowercase coin names and tickers to CoinGecko IDs.
+
+        Every trigger and keyword is one branch of a single alternation,
+        listed in priority order. Each branch starts with a literal
+        character, so the regex engine can skip straight to candidate
+        positions. Restarting one character after each hit reports
+        overlapping matches. When two branches match at the same position
+        only the higher-priority one is seen, which never changes the outcome.
+        """
+        self.aliases = aliases or {}
+
+        # (kind, literal, extra condition); a coin must follow 'price of ' etc.
+        branches = [(name, literal, r'(?=\w)' if side == 'after' else '') for name, literal, side in PRICE_PATTERNS]
+        for intent, words in RULE_KEYWORDS:
+            branches += [(intent, word, '') for word in sorted(words, key=len, reverse=True)]
+        branches += [('crypto', word, '') for word in sorted(CRYPTO_KEYWORDS, key=len, reverse=True)]
+
+        # Plain groups keep the leading literal visible to the engine's
+        # first-character prefilter; lastindex tells us which branch hit
+        self.pattern = re.compile('|'.join(
+            f"{re.escape(literal[0])}({re.escape(literal[1:])}){condition}" for _, literal, condition in branches
+        ))
+        self.kinds = [None] + [kind for kind, _, _ in branches]
+        self.price_patterns = {name: (rank, side) for rank, (name, _, side) in enumerate(PRICE_PATTERNS)}
+        self.rule_priority = {intent: rank for rank, (intent, _) in enumerate(RULE_KEYWORDS)}
+
+    def route(self, message):
+        """Classify a message
+
+        Returns a dict with the ``intent`` ('price', one of the rule intents,
+        or 'general'), the ``coin`` named in a price question, its
+        ``crypto_id``, and whether the message is ``crypto_related``.
+        """
+        text = message.lower()
+        reversed_text = None
+        best_price = None
+        best_rule = None
+        crypto_related = False
+
+        search = self.pattern.search
+        match = search(text)
+        while match is not None:
+            kind = self.kinds[match.lastindex]
+            start = match.start()
+
+            if kind == 'crypto':
+                crypto_related = True
+            elif kind in self.rule_priority:
+                if best_rule is None or self.rule_priority[kind] < self.rule_priority[best_rule]:
+                    best_rule = kind
+            else:
+                # Only the earliest match of each price pattern counts
+                rank, side = self.price_patterns[kind]
+                if best_price is None or rank < best_price[0]:
+                    if side == 'after':
+                        word = _WORD.match(text, match.end())
+                        coin = word.group() if word else None
+                    else:
+                        # The whole word run that ends right before the trigger
+                        if reversed_text is None:
+                            reversed_text = text[::-1]
+                        word = _WORD.match(reversed_text, len(text) - start)
+                        coin = word.group()[::-1] if word else None
+
+                    if coin:
+                        best_price = (rank, coin)
+                        if rank == 0:
+                            break
+
+            match = search(text, start + 1)
+
+        if best_price is not None:
+            coin = best_price[1]
+            return {
+                'intent': 'price',
+                'coin': coin,
+                'crypto_id': self.aliases.get(coin, coin),
+                'crypto_related': True
+            }
+
+        return {
+            'intent': best_rule or 'general',
+            'coin': None,
+            'crypto_id': None,
+            'crypto_related': crypto_related
+        }
@@ -0,0 +1,176 @@
+"""
+CryptoBud Market History Store
+Incremental on-disk price history per coin in memory-mapped columnar files
+"""
+
+import math
+import os
+import struct
+import threading
+import time
+import numpy as np
+
+DAY_MS = 86_400_000
+
+# Spacing of the points CoinGecko returns at each automatic granularity
+GRANULARITY_MS = {'5m': 300_000, 'hourly': 3_600_000, 'daily': DAY_MS}
+
+# File layout: header, then the timestamp column, then the price column
+MAGIC = b'CBTS'
+VERSION = 1
+HEADER = struct.Struct('<4sIqq')  # magic, version, point count, covered-since ms
+
+
+def granularity_for(days):
+    """CoinGecko's automatic market_chart granularity for a ``days`` value"""
+    if days == 'max':
+        return 'daily'
+    days = float(days)
+    if days <= 1:
+        return '5m'
+    if days <= 90:
+        return 'hourly'
+    return 'daily'
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class MarketHistoryStore:
+    def __init__(self, root='market_history', vs_currency='usd'):
+        """Store history under ``root``, one file per coin and granularity
+
+        Each file holds a timestamp column (int64 ms) and a price column
+        (float64) that are read back as memory maps. Files are rewritten
+        atomically on merge, so readers holding an old map are unaffected.
+        """
+        self.root = root
+        self.vs_currency = vs_currency
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, crypto_id, granularity):
+        return os.path.join(self.root, crypto_id, f"{self.vs_currency}_{granularity}.cbts")
+
+    def _lock(self, path):
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _parse_header(self, f):
+        """Return (count, since) from an open series file, or None"""
+        try:
+            magic, version, count, since = HEADER.unpack(f.read(HEADER.size))
+        except struct.error:
+            return None
+        if magic != MAGIC or version != VERSION:
+            return None
+        return count, since
+
+    def _read_header(self, path):
+        """Return (count, since) or None if there's no usable file"""
+        try:
+            with open(path, 'rb') as f:
+                return self._parse_header(f)
+        except OSError:
+            return None
+
+    def read(self, crypto_id, granularity):
+        """Return (timestamps, prices) for everything stored at a granularity"""
+        path = self._path(crypto_id, granularity)
+        try:
+            with open(path, 'rb') as f:
+                header = self._parse_header(f)
+                if header and header[0] > 0:
+                    count = header[0]
+                    timestamps = np.memmap(f, dtype='<i8', mode='r', offset=HEADER.size, shape=(count,))
+                    prices = np.memmap(f, dtype='<f8', mode='r', offset=HEADER.size + 8 * count, shape=(count,))
+                    return timestamps, prices
+        except OSError:
+            pass
+        return np.empty(0, dtype='<i8'), np.empty(0, dtype='<f8')
+
+    def read_window(self, crypto_id, days, now=None):
+        """Return (timestamps, prices) covering the last ``days`` days"""
+        timestamps, prices = self.read(crypto_id, granularity_for(days))
+        if days == 'max':
+            return timestamps, prices
+
+        start = (now or now_ms()) - int(float(days) * DAY_MS)
+        first = np.searchsorted(timestamps, start, side='left')
+        return timestamps[first:], prices[first:]
+
+    def plan_fetch(self, crypto_id, days, now=None):
+        """Work out which market_chart request brings a window up to date
+
+        Returns None when the stored data is already current, otherwise a
+        dict with the request ``params``, whether the response should
+        ``replace`` the stored series, and the ``since`` time it covers.
+        """
+        now = now or now_ms()
+        granularity = granularity_for(days)
+        step = GRANULARITY_MS[granularity]
+        window_start = 0 if days == 'max' else now - int(float(days) * DAY_MS)
+        params = {'vs_currency': self.vs_currency}
+
+        path = self._path(crypto_id, granularity)
+        header = self._read_header(path)
+        timestamps, _ = self.read(crypto_id, granularity)
+
+        # Nothing stored far enough back, or the stored data is older than
+        # the whole window: download the window
+        stale = len(timestamps) and days != 'max' and int(timestamps[-1]) <= window_start
+        if not header or not len(timestamps) or header[1] > window_start or stale:
+            params['days'] = days
+            return {'params': params, 'replace': True, 'since': window_start}
+
+        gap_ms = now - int(timestamps[-1])
+        if gap_ms < step:
+            return None
+
+        # Ask for a short window that still has the same granularity and
+        # overlaps the last stored point
+        gap_days = gap_ms / DAY_MS
+        if granularity == '5m':
+            params['days'] = 1
+        elif granularity == 'hourly':
+            params['days'] = max(2, math.ceil(gap_days))
+        else:
+            params['days'] = math.ceil(gap_days) + 1
+            params['interval'] = 'daily'
+        return {'params': params, 'replace': False, 'since': window_start}
+
+    def merge(self, crypto_id, days, timestamps, prices, replace=False, since=None):
+        """Merge fetched points into the store
+
+        Stored points at or after the first fetched timestamp are dropped, so
+        CoinGecko's trailing live point is superseded by the next fetch.
+        """
+        granularity = granularity_for(days)
+        path = self._path(crypto_id, granularity)
+        timestamps = np.asarray(timestamps, dtype='<i8')
+        prices = np.asarray(prices, dtype='<f8')
+
+        with self._lock(path):
+            header = self._read_header(path)
+            if replace or not header:
+                merged_ts, merged_px = timestamps, prices
+                covered = since if since is not None else (int(timestamps[0]) if len(timestamps) else 0)
+            else:
+                stored_ts, stored_px = self.read(crypto_id, granularity)
+                cut = np.searchsorted(stored_ts, timestamps[0], side='left') if len(timestamps) else len(stored_ts)
+                merged_ts = np.concatenate([stored_ts[:cut], timestamps])
+                merged_px = np.concatenate([stored_px[:cut], prices])
+                covered = header[1]
+
+            self._write(path, merged_ts, merged_px, covered)
+
+    def _write(self, path, timestamps, prices, since):
+        """Atomically replace a series file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(timestamps), int(since)))
+            f.write(np.ascontiguousarray(timestamps, dtype='<i8').tobytes())
+            f.write(np.ascontiguousarray(prices, dtype='<f8').tobytes())
+        os.replace(tmp_path, path)
@@ -0,0 +1,329 @@
+"""
+CryptoBud Metrics
+Counters, latency histograms, timing hooks and a sampling profiler with Prometheus and JSON export
+"""
+
+import bisect
+import functools
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from sub-millisecond routing to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Metric names shared by the instrumented modules
+CHAT_SECONDS = 'cryptobud_chat_seconds'
+CHAT_STAGE_SECONDS = 'cryptobud_chat_stage_seconds'
+ANALYZER_STEP_SECONDS = 'cryptobud_analyzer_step_seconds'
+UPSTREAM_SECONDS = 'cryptobud_upstream_request_seconds'
+UPSTREAM_ERRORS = 'cryptobud_upstream_errors_total'
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Process-wide store of counters and histograms
+
+        Values are keyed by metric name and labels. Hooks added with
+        ``add_hook`` see every timing as ``hook(name, seconds, labels)``;
+        collectors added with ``add_collector`` report gauges (such as cache
+        statistics) when metrics are exported.
+        """
+        self.buckets = buckets
+        self.enabled = True
+        self._counters = {}
+        self._histograms = {}
+        self._hooks = []
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Increment a counter"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration in a histogram and pass it to the hooks"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+        for hook in self._hooks:
+            try:
+                hook(name, seconds, labels)
+            except Exception as e:
+                print(f"Error in metrics hook: {e}")
+
+    @contextmanager
+    def timer(self, name, error_counter=None, **labels):
+        """Time a block into histogram ``name``
+
+        If the block raises, ``error_counter`` (when given) is incremented
+        with the same labels plus the exception type.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if error_counter:
+                self.inc(error_counter, error=type(e).__name__, **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def add_collector(self, name, collector):
+        """Register ``collector() -> [(metric, labels, value), ...]``, replacing any with the same name"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def _gauges(self):
+        with self._lock:
+            collectors = list(self._collectors.values())
+
+        gauges = []
+        for collector in collectors:
+            try:
+                gauges.extend((name, _label_key(labels), value) for name, labels, value in collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        return gauges
+
+    def snapshot(self):
+        """All metrics as a JSON-serializable dict"""
+        with self._lock:
+            counters = [(name, labels, value) for (name, labels), value in self._counters.items()]
+            histograms = [
+                (name, labels, histogram.count, histogram.sum, histogram.quantile(0.5), histogram.quantile(0.99))
+                for (name, labels), histogram in self._histograms.items()
+            ]
+
+        result = {'counters': {}, 'histograms': {}, 'gauges': {}}
+        for name, labels, value in counters:
+            result['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for name, labels, count, total, p50, p99 in histograms:
+            result['histograms'].setdefault(name, []).append({
+                'labels': dict(labels),
+                'count': count,
+                'sum': round(total, 6),
+                'mean': round(total / count, 6) if count else None,
+                'p50': round(p50, 6) if p50 is not None else None,
+                'p99': round(p99, 6) if p99 is not None else None
+            })
+        for name, labels, value in self._gauges():
+            result['gauges'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        return result
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, list(histogram.counts), histogram.sum, histogram.count) for key, histogram in self._histograms.items()),
+                key=lambda item: item[0]
+            )
+
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), counts, total, count in histograms:
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name, labels, value in sorted(self._gauges(), key=lambda item: item[:2]):
+            declare(name, 'gauge')
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+METRICS = MetricsRegistry()
+
+
+def timed(func, name, registry=METRICS, **labels):
+    """Wrap ``func`` so every call is timed into histogram ``name``"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with registry.timer(name, **labels):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def watch_cache(name, cache, registry=METRICS):
+    """Export a TTLCache's statistics and hit ratio as gauges"""
+    def collect():
+        stats = dict(cache.stats)
+        labels = {'cache': name}
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        gauges = [(f"cryptobud_cache_{stat}", labels, value) for stat, value in stats.items()]
+        gauges.append(('cryptobud_cache_entries', labels, len(cache)))
+        gauges.append(('cryptobud_cache_hit_ratio', labels, round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0))
+        return gauges
+
+    registry.add_collector(f"cache:{name}", collect)
+
+
+def watch_rate_limiter(name, limiter, registry=METRICS):
+    """Export a RateLimiter's call, retry and failure counts as gauges"""
+    def collect():
+        return [(f"cryptobud_upstream_{stat}", {'limiter': name}, value) for stat, value in dict(limiter.stats).items()]
+
+    registry.add_collector(f"limiter:{name}", collect)
+
+
+def watch_storage(name, storage, registry=METRICS):
+    """Export a write-behind storage adapter's queue depth and write counts as gauges"""
+    def collect():
+        labels = {'storage': name}
+        gauges = [(f"cryptobud_storage_{stat}", labels, value) for stat, value in dict(storage.stats).items()]
+        gauges.append(('cryptobud_storage_pending', labels, storage.pending))
+        return gauges
+
+    registry.add_collector(f"storage:{name}", collect)
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, max_depth=32):
+        """Statistical profiler sampling every thread's stack each ``interval`` seconds
+
+        Cheap enough to leave on in production for a while: nothing is
+        traced, a daemon thread just reads ``sys._current_frames()``.
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+                        frame = frame.f_back
+                    self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample, name='cryptobud-profiler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def top(self, limit=20):
+        """Functions seen at the top of the most samples, as [(frame, share)]"""
+        with self._lock:
+            leaves = Counter()
+            for stack, count in self.stacks.items():
+                if stack:
+                    leaves[stack[-1]] += count
+            total = sum(leaves.values()) or 1
+        return [(frame, round(count / total, 4)) for frame, count in leaves.most_common(limit)]
+
+    def collapsed(self):
+        """Samples in the collapsed-stack format flame graph tools read"""
+        with self._lock:
+            return '\n'.join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
@@ -0,0 +1,111 @@
+"""
+CryptoBud Prefetch Scheduler
+Background refresh of prices and market data so requests are answered from cache
+"""
+
+import threading
+import time
+
+import requests
+
+from chatbot import CRYPTO_IDS, PRICE_CACHE, fetch_prices
+from coingecko_async import COINGECKO_API
+from rate_limit import COINGECKO_LIMITER
+
+
+class PrefetchScheduler:
+    def __init__(self, analyzer=None, price_cache=None, streams=None, coins=(), price_interval=20,
+                 market_interval=90, coingecko_api=COINGECKO_API, rate_limiter=None):
+        """Keep tracked coins fresh on a daemon thread
+
+        Tracked coins are those in CRYPTO_IDS, the ``analyzer``'s
+        sustainability list and ``coins``. Every ``price_interval`` seconds
+        all their prices are fetched in one call into ``price_cache``
+        (PRICE_CACHE by default) and, if given, fed to ``streams`` (a
+        TrendStreams). Every ``market_interval`` seconds the analyzer's market
+        cache is refreshed for each coin. Intervals should stay below the
+        caches' TTLs so requests never find an expired entry.
+        """
+        self.analyzer = analyzer
+        self.price_cache = price_cache if price_cache is not None else PRICE_CACHE
+        self.streams = streams
+        self.coins = list(coins)
+        self.price_interval = price_interval
+        self.market_interval = market_interval
+        self.coingecko_api = coingecko_api
+        self.rate_limiter = rate_limiter if rate_limiter is not None else COINGECKO_LIMITER
+
+        self.session = requests.Session()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tracked_coins(self):
+        coins = set(CRYPTO_IDS.values()) | set(self.coins)
+        if self.analyzer is not None:
+            coins |= set(self.analyzer.sustainability_scores)
+        return sorted(coins)
+
+    def refresh_prices(self):
+        """Fetch every tracked price in one call and store it"""
+        coins = self.tracked_coins()
+        prices = fetch_prices(coins, self.session, self.coingecko_api, self.rate_limiter)
+
+        self.price_cache.put_many({coin: prices.get(coin) for coin in coins})
+        if self.streams is not None:
+            self.streams.update_many({coin: price['price'] for coin, price in prices.items()})
+        return prices
+
+    def refresh_market_data(self):
+        """Refresh the analyzer's market data for every tracked coin"""
+        if self.analyzer is None:
+            return
+
+        for coin in self.tracked_coins():
+            if self._stop.is_set():
+                return
+            try:
+                self.analyzer.prefetch(coin)
+            except Exception as e:
+                print(f"Error prefetching market data for {coin}: {e}")
+
+    def run_once(self):
+        """Run both jobs once, e.g. to warm caches before serving"""
+        try:
+            self.refresh_prices()
+        except Exception as e:
+            print(f"Error prefetching prices: {e}")
+        self.refresh_market_data()
+
+    def _run(self):
+        next_prices = next_market = time.monotonic()
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_prices:
+                try:
+                    self.refresh_prices()
+                except Exception as e:
+                    print(f"Error prefetching prices: {e}")
+                next_prices = time.monotonic() + self.price_interval
+
+            if self.analyzer is not None and now >= next_market:
+                self.refresh_market_data()
+                next_market = time.monotonic() + self.market_interval
+
+            due = next_prices if self.analyzer is None else min(next_prices, next_market)
+            self._stop.wait(max(0.0, due - time.monotonic()))
+
+    def start(self):
+        """Start refreshing in the background"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='cryptobud-prefetch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
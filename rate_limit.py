@@ -0,0 +1,232 @@
+"""
+CryptoBud Rate Limiting
+Token-bucket limiter with retry and backoff shared by every upstream API call
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+from metrics import watch_rate_limiter
+
+# HTTP statuses worth retrying: rate limited or a transient upstream failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, delay):
+        """A call would have had to wait ``delay`` seconds, more than its max_wait allowed"""
+        super().__init__(f"Rate limited: next call allowed in {delay:.1f}s")
+        self.delay = delay
+
+
+def _deadline(max_wait):
+    return None if max_wait is None else time.monotonic() + max_wait
+
+
+def _check_wait(delay, deadline):
+    """Raise RateLimitExceeded if waiting ``delay`` seconds would pass ``deadline``"""
+    if deadline is not None and time.monotonic() + delay > deadline:
+        raise RateLimitExceeded(delay)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        """Allow ``rate`` calls per second on average, in bursts of up to ``capacity``"""
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token if one is available, else return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, max_wait=None):
+        """Block until a call is allowed
+
+        With ``max_wait``, raise RateLimitExceeded right away instead of
+        waiting longer than that many seconds.
+        """
+        deadline = _deadline(max_wait)
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            _check_wait(delay, deadline)
+            time.sleep(delay)
+
+    async def acquire_async(self, max_wait=None):
+        """Wait without blocking the event loop until a call is allowed"""
+        deadline = _deadline(max_wait)
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            _check_wait(delay, deadline)
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        """Hold back every caller, e.g. after the upstream answers 429"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def _error_status(error):
+    """HTTP status and headers of a requests or aiohttp error, if it has them"""
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None) is not None:
+        return response.status_code, response.headers
+    status = getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status, getattr(error, 'headers', None) or {}
+    return None, {}
+
+
+def _is_transient(error):
+    """Network failures that did not get an HTTP answer"""
+    import requests
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        import aiohttp
+    except ImportError:
+        return False
+    return isinstance(error, aiohttp.ClientConnectionError)
+
+
+class RateLimiter:
+    def __init__(self, rate=0.5, burst=5, max_retries=3, backoff=1.0, max_backoff=30.0):
+        """Throttle and retry upstream calls
+
+        Calls are spaced by a token bucket refilling at ``rate`` per second
+        with room for ``burst`` back-to-back calls; ``rate=None`` turns the
+        throttle off. Rate-limit answers, 5xx responses and connection errors
+        are retried up to ``max_retries`` times with exponential backoff and
+        jitter starting at ``backoff`` seconds. A 429 pauses every caller
+        sharing the limiter, for Retry-After seconds when the API sends it.
+
+        Interactive callers pass ``max_wait`` to ``call``: when throttling or
+        a retry would make the call take longer than that, it fails at once
+        (RateLimitExceeded, or the error it would have retried) instead of
+        holding a worker thread.
+        """
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = {'calls': 0, 'retries': 0, 'rate_limited': 0, 'failures': 0, 'shed': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before retrying ``error``, or None to give up"""
+        if attempt >= self.max_retries:
+            return None
+
+        status, headers = _error_status(error)
+        if status is None:
+            if not _is_transient(error):
+                return None
+        elif status not in RETRY_STATUSES:
+            return None
+
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+        if status == 429:
+            self._count('rate_limited')
+            try:
+                delay = max(delay, min(self.max_backoff, float(headers.get('Retry-After'))))
+            except (TypeError, ValueError):
+                pass
+            if self.bucket is not None:
+                self.bucket.pause(delay)
+
+        return delay
+
+    def _acquire(self, deadline):
+        if self.bucket is not None:
+            try:
+                self.bucket.acquire(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except RateLimitExceeded:
+                self._count('shed')
+                raise
+
+    async def _acquire_async(self, deadline):
+        if self.bucket is not None:
+            try:
+                await self.bucket.acquire_async(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except RateLimitExceeded:
+                self._count('shed')
+                raise
+
+    def _give_up(self, delay, deadline):
+        """True if a retry ``delay`` seconds away isn't worth waiting for"""
+        if delay is None:
+            self._count('failures')
+            return True
+        if deadline is not None and time.monotonic() + delay > deadline:
+            self._count('shed')
+            return True
+        return False
+
+    def call(self, func, *args, max_wait=None, **kwargs):
+        """Run ``func`` under the limiter, retrying transient failures
+
+        With ``max_wait``, give up as soon as throttling and retries would
+        take longer than that many seconds in total.
+        """
+        deadline = _deadline(max_wait)
+        attempt = 0
+        while True:
+            self._acquire(deadline)
+            self._count('calls')
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if self._give_up(delay, deadline):
+                    raise
+            self._count('retries')
+            attempt += 1
+            time.sleep(delay)
+
+    async def call_async(self, func, *args, max_wait=None, **kwargs):
+        """Await ``func(*args, **kwargs)`` under the limiter, retrying transient failures"""
+        deadline = _deadline(max_wait)
+        attempt = 0
+        while True:
+            await self._acquire_async(deadline)
+            self._count('calls')
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if self._give_up(delay, deadline):
+                    raise
+            self._count('retries')
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+# Shared by every CoinGecko caller in the process; the free tier allows
+# roughly 30 calls a minute
+COINGECKO_LIMITER = RateLimiter(rate=0.5, burst=5)
+watch_rate_limiter('coingecko', COINGECKO_LIMITER)
@@ -0,0 +1,59 @@
+"""
+CryptoBud Request Memo
+Request-scoped memoization that runs each distinct call once, joining callers already waiting on it
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class RequestMemo:
+    def __init__(self):
+        """Remember results for the lifetime of one request
+
+        Unlike TTLCache nothing expires: create a memo per request (or per
+        batch of related requests) and drop it afterwards. A key is computed
+        by the first caller; threads or tasks asking for it meanwhile wait for
+        that result instead of computing it again. Failures are remembered
+        too, so every caller of a failing key sees the same exception.
+        """
+        self._futures = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'joined': 0}
+
+    def get(self, key, loader):
+        """Return ``loader()`` for ``key``, running it at most once"""
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+                self.stats['misses'] += 1
+            else:
+                self.stats['hits' if future.done() else 'joined'] += 1
+
+        if owner:
+            try:
+                future.set_result(loader())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    async def get_async(self, key, loader):
+        """Return ``await loader()`` for ``key``, awaiting it at most once
+
+        Cancelling one waiter doesn't cancel the shared call.
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(loader())
+                self.stats['misses'] += 1
+            else:
+                self.stats['hits' if task.done() else 'joined'] += 1
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._futures) + len(self._tasks)
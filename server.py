@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+CryptoBud Chat Server
+Async HTTP and WebSocket API for the chatbot and the crypto analyzer
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from aiohttp import web, WSMsgType
+
+from chatbot import CryptoBudBot, DEFAULT_DATABASE_PATH, STORAGE_MODES
+from coingecko_async import AsyncCoinGeckoClient
+from crypto_analyzer import CryptoAnalyzer
+from market_store import GRANULARITY_MS
+from metrics import METRICS, SamplingProfiler
+from prefetch import PrefetchScheduler
+from stream_analyzer import TrendStreams
+
+HTTP_SECONDS = 'cryptobud_http_request_seconds'
+
+# Coins one /compare request may rank; each costs two upstream calls
+MAX_COMPARE = 25
+
+# Longest session ID a client may choose; longer ones are rejected
+MAX_SESSION_ID_LENGTH = 128
+
+# Bot used by pool workers: shared by all threads, or one per worker process
+_worker_bot = None
+
+
+def _init_worker(bot_options):
+    """Build the bot a worker answers with"""
+    global _worker_bot
+    _worker_bot = CryptoBudBot(**bot_options)
+
+
+def _prepare_database(bot_options):
+    """Train or validate the database once, before any worker process opens it"""
+    bot = CryptoBudBot(**dict(bot_options, lazy=False, warm=False))
+    bot.close()
+
+
+def _worker_get_response(message, conversation):
+    """Run one chat turn on the worker's bot"""
+    return str(_worker_bot.get_response(message, conversation=conversation))
+
+
+async def _json_object(request):
+    """Decode a request body that must be a JSON object"""
+    try:
+        payload = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text="Expected a JSON body")
+    if not isinstance(payload, dict):
+        raise web.HTTPBadRequest(text="Expected a JSON object")
+    return payload
+
+
+def _session_id(value):
+    """Validate a client-chosen session ID; None starts a new session"""
+    if value is None:
+        return None
+    if not isinstance(value, str) or len(value) > MAX_SESSION_ID_LENGTH:
+        raise web.HTTPBadRequest(text=f"'session_id' must be a string of at most {MAX_SESSION_ID_LENGTH} characters")
+    return value
+
+
+class ChatSession:
+    def __init__(self, session_id):
+        """Per-connection chat state"""
+        self.id = session_id
+        self.conversation = f"session:{session_id}"
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+        self.turns = 0
+        # Turns within one session are answered in order
+        self.lock = asyncio.Lock()
+
+
+class ChatServer:
+    def __init__(self, bot_options=None, workers=8, executor='thread', max_pending=256, session_ttl=1800,
+                 prefetch_interval=20, trend_window=3600, profile=False):
+        """Configure the server
+
+        Blocking ChatterBot/SQLite work runs on ``workers`` threads (sharing
+        one bot) or processes (one bot each). Worker processes are started
+        with forkserver (spawn where unavailable), after the database has
+        been trained once in this process. At most ``max_pending`` chat
+        turns may be queued or running; beyond that HTTP requests get a 503
+        and WebSocket clients wait. Idle sessions expire after
+        ``session_ttl`` seconds.
+
+        Unless ``prefetch_interval`` is 0, a PrefetchScheduler refreshes
+        prices that often so price questions are answered from cache. In
+        process mode only the analyzer endpoints benefit, since each worker
+        process keeps its own price cache. Each refresh is also a tick for
+        the live trend of every tracked coin over the last ``trend_window``
+        seconds, served by GET /trend/{crypto_id}.
+
+        /metrics and /stats export the process-wide METRICS registry (in
+        process mode that excludes the chat stages timed inside workers).
+        With ``profile`` a SamplingProfiler runs from startup; POST /profile
+        turns it on or off at runtime.
+        """
+        self.bot_options = bot_options or {}
+        self.workers = workers
+        self.executor_kind = executor
+        self.max_pending = max_pending
+        self.session_ttl = session_ttl
+
+        self.executor = None
+        self.analyzer = CryptoAnalyzer()
+        self.client = None
+        self.sessions = {}
+        self.pending = 0
+        self._slots = None
+        self.profiler = SamplingProfiler()
+        if profile:
+            self.profiler.start()
+        self.streams = TrendStreams(max_points=None, window_seconds=trend_window)
+        self.prefetcher = None
+        if prefetch_interval:
+            self.prefetcher = PrefetchScheduler(analyzer=self.analyzer, streams=self.streams,
+                                                price_interval=prefetch_interval)
+
+    async def start(self, app):
+        """aiohttp cleanup context: bring the pools up, then tear them down"""
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_pending)
+
+        if self.executor_kind == 'process':
+            read_only = self.bot_options.get('prebuilt_database') or self.bot_options.get('storage_mode') == 'replica'
+            if not read_only:
+                # Workers would otherwise all train into the same file at once
+                await loop.run_in_executor(None, _prepare_database, self.bot_options)
+
+            # Forked children would inherit locks held by the prefetcher,
+            # profiler and event loop threads; start them clean instead
+            methods = multiprocessing.get_all_start_methods()
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.bot_options,),
+                mp_context=multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='cryptobud')
+            # One bot shared by every thread; built off the event loop
+            await loop.run_in_executor(self.executor, _init_worker, self.bot_options)
+
+        self.client = await AsyncCoinGeckoClient(self.analyzer.coingecko_api).start()
+        sweeper = asyncio.ensure_future(self._expire_sessions())
+        if self.prefetcher is not None:
+            self.prefetcher.start()
+
+        yield
+
+        if self.prefetcher is not None:
+            self.prefetcher.stop(timeout=1)
+        sweeper.cancel()
+        await self.client.close()
+        self.executor.shutdown(wait=False)
+        self.profiler.stop()
+
+    def _collect(self):
+        return [
+            ('cryptobud_server_sessions', {}, len(self.sessions)),
+            ('cryptobud_server_pending_turns', {}, self.pending)
+        ]
+
+    @web.middleware
+    async def _timing_middleware(self, request, handler):
+        """Time every HTTP request by route; WebSocket lifetimes are left out"""
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else 'unmatched'
+        if route == '/ws':
+            return await handler(request)
+
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            METRICS.observe(HTTP_SECONDS, time.perf_counter() - start, route=route)
+            METRICS.inc('cryptobud_http_responses_total', route=route, status=status)
+
+    async def _expire_sessions(self):
+        """Drop sessions that have been idle longer than session_ttl"""
+        while True:
+            await asyncio.sleep(min(60, self.session_ttl))
+            cutoff = time.monotonic() - self.session_ttl
+            for session_id in [sid for sid, s in self.sessions.items() if s.last_seen < cutoff]:
+                self.sessions.pop(session_id, None)
+
+    def get_session(self, session_id=None):
+        """Return an existing session or start a new one"""
+        session = self.sessions.get(session_id) if session_id else None
+        if session is None:
+            session = ChatSession(session_id or uuid.uuid4().hex)
+            self.sessions[session.id] = session
+        session.last_seen = time.monotonic()
+        return session
+
+    async def chat(self, session, message):
+        """Answer one message on the worker pool"""
+        async with self._slots:
+            self.pending += 1
+            try:
+                async with session.lock:
+                    loop = asyncio.get_running_loop()
+                    response = await loop.run_in_executor(
+                        self.executor, _worker_get_response, message, session.conversation
+                    )
+                    session.turns += 1
+                    session.last_seen = time.monotonic()
+                    return response
+            finally:
+                self.pending -= 1
+
+    async def handle_chat(self, request):
+        """POST /chat {"message": ..., "session_id": ...}"""
+        payload = await _json_object(request)
+        message = str(payload.get('message', '')).strip()
+        if not message:
+            raise web.HTTPBadRequest(text="'message' is required")
+
+        if self.pending >= self.max_pending:
+            METRICS.inc('cryptobud_server_rejected_total')
+            raise web.HTTPServiceUnavailable(headers={'Retry-After': '1'}, text="Server busy, try again shortly")
+
+        session = self.get_session(_session_id(payload.get('session_id')))
+        response = await self.chat(session, message)
+        return web.json_response({'session_id': session.id, 'response': response})
+
+    async def handle_websocket(self, request):
+        """GET /ws: one chat session per connection
+
+        Clients send plain text or {"message": ...}; each reply is
+        {"response": ...}. Messages are answered one at a time, so a slow
+        pool pushes back on the client through the socket.
+        """
+        session_id = _session_id(request.query.get('session_id'))
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        session = self.get_session(session_id)
+        await ws.send_json({'session_id': session.id})
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+
+                message = msg.data
+                try:
+                    decoded = json.loads(message)
+                    if isinstance(decoded, dict):
+                        message = str(decoded.get('message', ''))
+                except json.JSONDecodeError:
+                    pass
+
+                message = message.strip()
+                if not message:
+                    continue
+
+                try:
+                    response = await self.chat(session, message)
+                except Exception as e:
+                    await ws.send_json({'error': f"Sorry, I encountered an error: {e}"})
+                    continue
+                await ws.send_json({'response': response})
+        finally:
+            self.sessions.pop(session.id, None)
+
+        return ws
+
+    async def handle_analyze(self, request):
+        """GET /analyze/{crypto_id}?days=7 or ?timeframes=1,7,30,90[&granularity=daily]"""
+        crypto_id = request.match_info['crypto_id']
+        if 'timeframes' in request.query:
+            try:
+                timeframes = [int(days) for days in request.query['timeframes'].split(',') if days]
+            except ValueError:
+                raise web.HTTPBadRequest(text="'timeframes' must be whole numbers of days")
+            granularity = request.query.get('granularity')
+            if not timeframes or min(timeframes) < 1:
+                raise web.HTTPBadRequest(text="'timeframes' must list at least one positive number of days")
+            if granularity is not None and granularity not in GRANULARITY_MS:
+                raise web.HTTPBadRequest(text=f"'granularity' must be one of {', '.join(GRANULARITY_MS)}")
+
+            result = await self.analyzer.analyze_timeframes_async(crypto_id, timeframes, granularity, client=self.client)
+            return self._analysis_response(result)
+
+        try:
+            days = int(request.query.get('days', 7))
+        except ValueError:
+            raise web.HTTPBadRequest(text="'days' must be a whole number")
+        if days < 1:
+            raise web.HTTPBadRequest(text="'days' must be a positive number of days")
+        result = await self.analyzer.analyze_price_trend_async(crypto_id, days, client=self.client)
+        return self._analysis_response(result)
+
+    async def handle_recommend(self, request):
+        """GET /recommend/{crypto_id}"""
+        result = await self.analyzer.get_investment_recommendation_async(request.match_info['crypto_id'], client=self.client)
+        return self._analysis_response(result)
+
+    async def handle_compare(self, request):
+        """GET /compare?ids=bitcoin,ethereum; three or more IDs get a ranking and pairwise matrix"""
+        ids = list(dict.fromkeys(crypto_id for crypto_id in request.query.get('ids', '').split(',') if crypto_id))
+        if not 2 <= len(ids) <= MAX_COMPARE:
+            raise web.HTTPBadRequest(text=f"'ids' must name between 2 and {MAX_COMPARE} cryptocurrencies")
+
+        if len(ids) == 2:
+            result = await self.analyzer.compare_cryptocurrencies_async(ids[0], ids[1], client=self.client)
+        else:
+            result = await self.analyzer.compare_many_async(ids, client=self.client)
+        return self._analysis_response(result)
+
+    async def handle_screen(self, request):
+        """GET /screen?limit=500"""
+        try:
+            limit = min(int(request.query.get('limit', 100)), 2500)
+        except ValueError:
+            raise web.HTTPBadRequest(text="'limit' must be a whole number")
+
+        result = await self.analyzer.screen_markets_async(limit, client=self.client)
+        return self._analysis_response(result)
+
+    async def handle_trend(self, request):
+        """GET /trend/{crypto_id}: trend and risk over the prefetcher's recent price ticks"""
+        crypto_id = request.match_info['crypto_id']
+        result = self.streams.snapshot(crypto_id)
+        if result is None:
+            raise web.HTTPNotFound(text=f"No live prices for '{crypto_id}'; only coins the prefetcher tracks have a trend")
+        return self._analysis_response(result)
+
+    def _analysis_response(self, result):
+        """Analyzer methods return None or a message string when they fail"""
+        if result is None:
+            raise web.HTTPBadGateway(text="Upstream market data unavailable")
+        if isinstance(result, str):
+            return web.json_response({'error': result}, status=422)
+        return web.json_response(result)
+
+    async def handle_health(self, request):
+        """GET /health"""
+        chatterbot_loaded = _worker_bot.chatbot_loaded if _worker_bot is not None else None
+        return web.json_response({
+            'status': 'ok',
+            'sessions': len(self.sessions),
+            'pending': self.pending,
+            'chatterbot_loaded': chatterbot_loaded
+        })
+
+    async def handle_metrics(self, request):
+        """GET /metrics in the Prometheus text format"""
+        return web.Response(text=METRICS.to_prometheus(), content_type='text/plain', charset='utf-8')
+
+    async def handle_stats(self, request):
+        """GET /stats: metrics as JSON, plus the profiler's hottest frames when it runs"""
+        stats = METRICS.snapshot()
+        if self.profiler.running:
+            stats['profile'] = {'samples': self.profiler.samples, 'top': self.profiler.top()}
+        return web.json_response(stats)
+
+    async def handle_profile(self, request):
+        """GET /profile: collapsed stacks; POST /profile {"enabled": bool} toggles sampling"""
+        if request.method == 'POST':
+            payload = await _json_object(request)
+            if payload.get('enabled'):
+                if payload.get('reset'):
+                    self.profiler.reset()
+                self.profiler.start()
+            else:
+                self.profiler.stop()
+            return web.json_response({'enabled': self.profiler.running, 'samples': self.profiler.samples})
+
+        return web.Response(text=self.profiler.collapsed(), content_type='text/plain')
+
+    def make_app(self):
+        METRICS.add_collector('server', self._collect)
+        app = web.Application(middlewares=[self._timing_middleware])
+        app.cleanup_ctx.append(self.start)
+        app.add_routes([
+            web.post('/chat', self.handle_chat),
+            web.get('/ws', self.handle_websocket),
+            web.get('/analyze/{crypto_id}', self.handle_analyze),
+            web.get('/recommend/{crypto_id}', self.handle_recommend),
+            web.get('/trend/{crypto_id}', self.handle_trend),
+            web.get('/compare', self.handle_compare),
+            web.get('/screen', self.handle_screen),
+            web.get('/health', self.handle_health),
+            web.get('/metrics', self.handle_metrics),
+            web.get('/stats', self.handle_stats),
+            web.get('/profile', self.handle_profile),
+            web.post('/profile', self.handle_profile),
+        ])
+        return app
+
+
+def main():
+    """Run the CryptoBud server"""
+    parser = argparse.ArgumentParser(description="CryptoBud HTTP/WebSocket server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=8, help="Threads or processes answering chat turns")
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--max-pending', type=int, default=256, help="Chat turns allowed in flight before shedding load")
+    parser.add_argument('--session-ttl', type=int, default=1800, help="Seconds before an idle session expires")
+    parser.add_argument('--prefetch-interval', type=int, default=20, help="Seconds between background price refreshes (0 disables)")
+    parser.add_argument('--trend-window', type=int, default=3600, help="Seconds of prefetched prices /trend analyzes")
+    parser.add_argument('--profile', action='store_true', help="Run the sampling profiler from startup")
+    parser.add_argument('--database', default=DEFAULT_DATABASE_PATH)
+    parser.add_argument('--prebuilt', help="Serve from a baked read-only database")
+    parser.add_argument('--vector-index', action='store_true', help="Use the TF-IDF statement index for fallback lookups")
+    parser.add_argument('--fast-start', action='store_true', help="Serve price and rule answers while ChatterBot loads in the background")
+    parser.add_argument('--storage', choices=STORAGE_MODES, default='sync',
+                        help="Learn synchronously, through a batched background writer, or not at all as a read-only replica")
+    args = parser.parse_args()
+
+    bot_options = {
+        'database_path': args.database,
+        'prebuilt_database': args.prebuilt,
+        'vector_index': args.vector_index,
+        'lazy': args.fast_start,
+        'warm': args.fast_start,
+        'storage_mode': args.storage
+    }
+
+    server = ChatServer(
+        bot_options=bot_options,
+        workers=args.workers,
+        executor=args.executor,
+        max_pending=args.max_pending,
+        session_ttl=args.session_ttl,
+        prefetch_interval=args.prefetch_interval,
+        trend_window=args.trend_window,
+        profile=args.profile
+    )
+
+    print(f"🚀 CryptoBud server listening on http://{args.host}:{args.port}")
+    web.run_app(server.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
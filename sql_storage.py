@@ -0,0 +1,176 @@
+"""
+CryptoBud SQL Storage
+Write-behind ChatterBot storage that learns statements in batched transactions
+"""
+
+import atexit
+import queue
+import threading
+import time
+from collections import Counter
+
+from chatterbot.storage import SQLStorageAdapter
+
+from metrics import METRICS
+
+# Tells the writer thread to finish what it has and exit
+_STOP = object()
+
+
+class WriteBehindSQLStorageAdapter(SQLStorageAdapter):
+    def __init__(self, **kwargs):
+        """SQLStorageAdapter whose learned statements are written in the background
+
+        ``create`` queues the statement and returns at once; a writer thread
+        drains the queue and stores up to ``batch_size`` statements per
+        transaction, waiting at most ``flush_interval`` seconds to fill a
+        batch. Bigram tagging of new statements happens on the writer thread
+        too. When ``max_pending`` statements are waiting, ``create`` blocks
+        until the writer catches up.
+
+        SQLStorageAdapter already runs SQLite in WAL mode, so the fallback's
+        reads never wait on a batch being written. Connections also wait up to
+        ``busy_timeout`` seconds for a lock held by another process instead of
+        failing.
+        """
+        super().__init__(**kwargs)
+        self.batch_size = kwargs.get('batch_size', 256)
+        self.flush_interval = kwargs.get('flush_interval', 0.5)
+        self.busy_timeout = kwargs.get('busy_timeout', 5.0)
+
+        if self.database_uri.startswith('sqlite://'):
+            from sqlalchemy import event
+
+            @event.listens_for(self.engine, 'connect')
+            def set_busy_timeout(dbapi_connection, connection_record):
+                dbapi_connection.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'failures': 0}
+        self._queue = queue.Queue(maxsize=kwargs.get('max_pending', 10000))
+        # Conversations with statements still in the queue
+        self._pending_conversations = Counter()
+        self._lock = threading.Lock()
+        # Keeps statements and flush markers from being queued after the stop sentinel
+        self._close_lock = threading.Lock()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='cryptobud-storage-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def create(self, **kwargs):
+        """Queue a statement to be stored and return it without an ID"""
+        statement = self.get_object('statement')(**kwargs)
+        with self._close_lock:
+            if not self._closed:
+                with self._lock:
+                    self._pending_conversations[statement.conversation] += 1
+                    self.stats['queued'] += 1
+                self._queue.put(statement)
+                return statement
+
+        # The writer has stopped, e.g. at interpreter exit
+        return super().create(**kwargs)
+
+    def create_many(self, statements):
+        """Store statements in one transaction, after anything already queued"""
+        self.flush()
+        super().create_many(statements)
+
+    def update(self, statement):
+        self.flush()
+        return super().update(statement)
+
+    def filter(self, **kwargs):
+        """Query statements, first writing out any still queued for the same conversation
+
+        ChatterBot finds the previous turn by its conversation, so a lookup
+        must not miss statements that are only waiting in the queue.
+        """
+        conversation = kwargs.get('conversation')
+        if conversation is not None and self._pending_conversations.get(conversation):
+            self.flush()
+        return super().filter(**kwargs)
+
+    def flush(self, timeout=None):
+        """Wait until every statement queued so far is written; True if it was in time"""
+        done = None
+        with self._close_lock:
+            if not self._closed:
+                done = threading.Event()
+                self._queue.put(done)
+
+        if done is None:
+            # Closing: the writer writes out everything left before it stops
+            self._writer.join(timeout)
+            return not self._writer.is_alive()
+        return done.wait(timeout)
+
+    def close(self):
+        """Write out the queue and stop the writer thread"""
+        with self._close_lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(_STOP)
+        self._writer.join()
+
+    def _write_loop(self):
+        while True:
+            batch, markers, stop = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+            for marker in markers:
+                marker.set()
+            if stop:
+                return
+
+    def _next_batch(self):
+        """Block for the next statement, then collect more until the batch is full or a flush is asked for"""
+        batch, markers = [], []
+        deadline = None
+        while len(batch) < self.batch_size:
+            try:
+                if deadline is None:
+                    item = self._queue.get()
+                    deadline = time.monotonic() + self.flush_interval
+                else:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+
+            if item is _STOP:
+                # Statements queued while closing and flushes still waiting
+                # are handled before the writer exits
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        return batch, markers, True
+                    (markers if isinstance(item, threading.Event) else batch).append(item)
+            if isinstance(item, threading.Event):
+                markers.append(item)
+                break
+            batch.append(item)
+        return batch, markers, False
+
+    def _write_batch(self, batch):
+        try:
+            with METRICS.timer('cryptobud_storage_flush_seconds'):
+                super().create_many(batch)
+        except Exception as e:
+            print(f"Error writing {len(batch)} learned statements: {e}")
+            with self._lock:
+                self.stats['failures'] += 1
+        else:
+            with self._lock:
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+        finally:
+            with self._lock:
+                for statement in batch:
+                    self._pending_conversations[statement.conversation] -= 1
+                    if not self._pending_conversations[statement.conversation]:
+                        del self._pending_conversations[statement.conversation]
@@ -0,0 +1,241 @@
+"""
+CryptoBud Statement Index
+TF-IDF inverted index over stored statements for fast BestMatch candidate lookup
+"""
+
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+_TOKEN = re.compile(r'\w+')
+
+INDEX_FORMAT = 1
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class StatementIndex:
+    def __init__(self, max_df_ratio=0.3, min_docs_for_pruning=50, rebuild_ratio=0.1):
+        """Create an empty index
+
+        Terms that appear in more than ``max_df_ratio`` of all statements
+        carry almost no signal, so their postings are skipped at query time.
+        That keeps lookups sublinear once the index holds at least
+        ``min_docs_for_pruning`` statements. Document norms are refreshed by
+        ``maybe_rebuild`` once the index has grown by ``rebuild_ratio``
+        since they were last computed.
+        """
+        self.max_df_ratio = max_df_ratio
+        self.min_docs_for_pruning = min_docs_for_pruning
+        self.rebuild_ratio = rebuild_ratio
+        self.added_since_rebuild = 0
+
+        self.docs = []               # [text, search_text]
+        self.doc_norms = []
+        self.postings = defaultdict(list)  # term -> [(doc_id, tf weight)]
+        self.doc_ids_by_text = {}
+        self.max_statement_id = 0
+        self.digest = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        # Indexes saved before norms were refreshed get one rebuild on their next sync
+        state.setdefault('rebuild_ratio', 0.1)
+        state.setdefault('added_since_rebuild', len(state['docs']))
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _idf(self, term):
+        return math.log((len(self.docs) + 1) / (len(self.postings.get(term, ())) + 1)) + 1
+
+    def add(self, text, search_text=None, statement_id=None):
+        """Index a statement; repeated texts are stored once"""
+        with self._lock:
+            if statement_id is not None:
+                self.max_statement_id = max(self.max_statement_id, statement_id)
+
+            doc_id = self.doc_ids_by_text.get(text)
+            if doc_id is not None:
+                if search_text and not self.docs[doc_id][1]:
+                    self.docs[doc_id][1] = search_text
+                return
+
+            counts = Counter(tokenize(text))
+            if not counts:
+                return
+
+            doc_id = len(self.docs)
+            self.docs.append([text, search_text])
+            self.doc_ids_by_text[text] = doc_id
+            self.added_since_rebuild += 1
+
+            weights = {term: 1 + math.log(count) for term, count in counts.items()}
+            for term, weight in weights.items():
+                self.postings[term].append((doc_id, weight))
+
+            # Norm uses the IDF at insert time; rebuild() refreshes it
+            self.doc_norms.append(math.sqrt(sum((weight * self._idf(term)) ** 2 for term, weight in weights.items())) or 1.0)
+
+    def query(self, text, limit=20):
+        """Return up to ``limit`` (text, search_text, score) candidates, best first"""
+        query_terms = Counter(tokenize(text))
+
+        with self._lock:
+            total_docs = len(self.docs)
+            prune = total_docs >= self.min_docs_for_pruning
+
+            for skip_common in ((True, False) if prune else (False,)):
+                scores = defaultdict(float)
+                for term, count in query_terms.items():
+                    posting = self.postings.get(term)
+                    if not posting:
+                        continue
+                    if skip_common and len(posting) > self.max_df_ratio * total_docs:
+                        continue
+
+                    idf = self._idf(term)
+                    query_weight = (1 + math.log(count)) * idf * idf
+                    for doc_id, weight in posting:
+                        scores[doc_id] += query_weight * weight
+
+                if scores:
+                    break
+
+            best = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+            return [
+                (self.docs[doc_id][0], self.docs[doc_id][1], score / self.doc_norms[doc_id])
+                for doc_id, score in best
+            ]
+
+    def sync(self, storage):
+        """Index statements added to storage since the index was last updated"""
+        Statement = storage.get_model('statement')
+        session = storage.Session()
+        try:
+            rows = session.query(Statement.id, Statement.text, Statement.search_text, Statement.persona).filter(
+                Statement.id > self.max_statement_id
+            ).order_by(Statement.id).yield_per(1000)
+
+            for statement_id, text, search_text, persona in rows:
+                # Match IndexedTextSearch, which never matches the bot's own lines
+                if persona and persona.startswith('bot:'):
+                    with self._lock:
+                        self.max_statement_id = max(self.max_statement_id, statement_id)
+                    continue
+                self.add(text, search_text, statement_id)
+        finally:
+            session.close()
+        self.maybe_rebuild()
+        return self
+
+    @classmethod
+    def from_storage(cls, storage, **kwargs):
+        """Build an index over every non-bot statement in a SQL storage adapter"""
+        return cls(**kwargs).sync(storage)
+
+    def rebuild(self):
+        """Recompute every document norm with the current IDFs
+
+        Queries always use current IDFs, but a norm keeps the IDFs from when
+        its statement was added, so norms drift as the index grows.
+        """
+        with self._lock:
+            squares = [0.0] * len(self.docs)
+            for term, posting in self.postings.items():
+                idf = self._idf(term)
+                for doc_id, weight in posting:
+                    squares[doc_id] += (weight * idf) ** 2
+            self.doc_norms = [math.sqrt(total) or 1.0 for total in squares]
+            self.added_since_rebuild = 0
+
+    def maybe_rebuild(self):
+        """Rebuild if the index grew by more than ``rebuild_ratio`` since the last rebuild"""
+        if self.added_since_rebuild > self.rebuild_ratio * len(self.docs):
+            self.rebuild()
+            return True
+        return False
+
+    def save(self, path, digest=None):
+        """Pickle the index, tagged with the training hash it was built for"""
+        self.digest = digest if digest is not None else self.digest
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'format': INDEX_FORMAT, 'index': self}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, digest=None):
+        """Load a saved index, or None if it's missing or built for other training data"""
+        try:
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        if payload.get('format') != INDEX_FORMAT:
+            return None
+        index = payload['index']
+        if digest is not None and index.digest != digest:
+            return None
+        return index
+
+
+class VectorIndexSearch:
+    name = 'vector_index_search'
+
+    def __init__(self, chatbot, index, fallback, candidates=20):
+        """Drop-in replacement for ChatterBot's IndexedTextSearch
+
+        Candidates come from a StatementIndex instead of a LIKE scan over the
+        statement table, then are scored with ``fallback``'s comparison
+        function. Results are yielded in increasing confidence, as BestMatch
+        expects, so its ``maximum_similarity_threshold`` cut-off is unchanged.
+        """
+        self.chatbot = chatbot
+        self.index = index
+        self.fallback = fallback
+        self.candidates = candidates
+        self.compare_statements = fallback.compare_statements
+
+    def search(self, input_statement, **additional_parameters):
+        # The index can't apply arbitrary storage filters
+        if additional_parameters or not len(self.index):
+            yield from self.fallback.search(input_statement, **additional_parameters)
+            return
+
+        candidates = self.index.query(input_statement.text, self.candidates)
+        if not candidates:
+            # No indexed term in common; the LIKE scan may still find a match
+            yield from self.fallback.search(input_statement, **additional_parameters)
+            return
+
+        from chatterbot.conversation import Statement
+
+        closest_confidence = 0
+
+        for text, search_text, _ in candidates:
+            statement = Statement(text=text, search_text=search_text or '')
+            confidence = self.compare_statements(input_statement, statement)
+
+            if confidence > closest_confidence:
+                if not statement.search_text:
+                    statement.search_text = self.chatbot.storage.tagger.get_bigram_pair_string(text)
+                statement.confidence = confidence
+                closest_confidence = confidence
+                yield statement
@@ -0,0 +1,134 @@
+"""
+CryptoBud Streaming Trend Analyzer
+Rolling-window trend and risk classification updated one price tick at a time
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from crypto_analyzer import classify_trend, classify_risk
+
+
+class StreamingTrendAnalyzer:
+    def __init__(self, max_points=168, window_seconds=None, resync_every=10_000):
+        """Keep a rolling window of price ticks
+
+        The window holds at most ``max_points`` ticks and, if
+        ``window_seconds`` is set, only ticks that recent. Ticks without a
+        positive price are ignored, since changes are relative to the
+        previous price. The running sum
+        of absolute changes is recomputed every ``resync_every`` evictions
+        so floating point drift stays bounded.
+        """
+        if max_points is None and window_seconds is None:
+            raise ValueError("Set max_points, window_seconds, or both")
+
+        self.max_points = max_points
+        self.window_seconds = window_seconds
+        self.resync_every = resync_every
+
+        self._ticks = deque()        # (timestamp, price)
+        self._abs_changes = deque()  # |percent change| between neighbouring ticks
+        self._abs_change_sum = 0.0
+        self._evictions = 0
+
+    def update(self, price, timestamp=None):
+        """Add a price tick in O(1) amortized time"""
+        if not price > 0:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+
+        if self._ticks:
+            previous = self._ticks[-1][1]
+            change = abs((price - previous) / previous) * 100
+            self._abs_changes.append(change)
+            self._abs_change_sum += change
+
+        self._ticks.append((timestamp, price))
+        self._evict(timestamp)
+
+    def extend(self, prices, timestamps=None):
+        """Seed the window from a price history"""
+        if timestamps is None:
+            for price in prices:
+                self.update(float(price))
+        else:
+            for timestamp, price in zip(timestamps, prices):
+                self.update(float(price), float(timestamp))
+
+    def _evict(self, now):
+        """Drop ticks that fall outside the window"""
+        while self._ticks and (
+            (self.max_points is not None and len(self._ticks) > self.max_points) or
+            (self.window_seconds is not None and self._ticks[0][0] < now - self.window_seconds)
+        ):
+            self._ticks.popleft()
+            if self._abs_changes:
+                self._abs_change_sum -= self._abs_changes.popleft()
+            self._evictions += 1
+
+            if self._evictions % self.resync_every == 0:
+                self._abs_change_sum = math.fsum(self._abs_changes)
+
+    def __len__(self):
+        return len(self._ticks)
+
+    def snapshot(self, now=None):
+        """Return the current analysis, in the same shape as analyze_price_trend
+
+        Ticks that have aged out of ``window_seconds`` by ``now`` (the
+        current time by default) are dropped first, so a stream that stopped
+        receiving ticks doesn't keep reporting a stale window.
+        """
+        if self.window_seconds is not None:
+            self._evict(time.time() if now is None else now)
+        if len(self._ticks) < 2:
+            return "insufficient_data"
+
+        start_price = self._ticks[0][1]
+        end_price = self._ticks[-1][1]
+        change_percent = ((end_price - start_price) / start_price) * 100
+        volatility = max(self._abs_change_sum, 0.0) / len(self._abs_changes)
+
+        return {
+            'trend': str(classify_trend(change_percent)),
+            'change_percent': round(change_percent, 2),
+            'volatility': round(volatility, 2),
+            'risk_level': str(classify_risk(volatility)),
+            'start_price': round(start_price, 2),
+            'end_price': round(end_price, 2)
+        }
+
+
+class TrendStreams:
+    def __init__(self, **analyzer_options):
+        """Thread-safe collection of streaming analyzers, one per coin"""
+        self.analyzer_options = analyzer_options
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def update(self, crypto_id, price, timestamp=None):
+        """Add a tick for one coin"""
+        with self._lock:
+            stream = self._streams.get(crypto_id)
+            if stream is None:
+                stream = self._streams[crypto_id] = StreamingTrendAnalyzer(**self.analyzer_options)
+            stream.update(price, timestamp)
+
+    def update_many(self, prices, timestamp=None):
+        """Add one tick per coin from a {crypto_id: price} dict"""
+        timestamp = time.time() if timestamp is None else timestamp
+        for crypto_id, price in prices.items():
+            self.update(crypto_id, price, timestamp)
+
+    def snapshot(self, crypto_id):
+        """Current analysis for a coin, or None if it has no ticks"""
+        with self._lock:
+            stream = self._streams.get(crypto_id)
+            return stream.snapshot() if stream is not None else None
+
+    def coins(self):
+        with self._lock:
+            return list(self._streams)
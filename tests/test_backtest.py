@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from backtest import Backtester, market_cap_ranks
+from chart_parser import parse_market_chart_series
+
+
+def test_missing_market_cap_ranks_last():
+    caps = np.array([[np.nan, 3.0], [2.0, 1.0], [3.0, 2.0]])
+
+    ranks = market_cap_ranks(caps)
+
+    np.testing.assert_array_equal(ranks, [[np.nan, 1.0], [2.0, 3.0], [1.0, 2.0]])
+
+
+def test_non_positive_horizons_are_rejected():
+    with pytest.raises(ValueError):
+        Backtester(analyzer=object(), horizons=(1, 0))
+
+
+def test_history_series_parsed_in_one_pass():
+    body = b'{"prices": [[1000, 2.5], [2000, 3.5]], "market_caps": [[1000, 10], [2000, 20]], "total_volumes": [[1000, 1]]}'
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+    chart = parse_market_chart_series(chunks, ('prices', 'market_caps'))
+
+    np.testing.assert_array_equal(chart['prices'][1], [2.5, 3.5])
+    np.testing.assert_array_equal(chart['market_caps'][0], [1000, 2000])
+    np.testing.assert_array_equal(chart['market_caps'][1], [10.0, 20.0])
@@ -0,0 +1,20 @@
+import json
+
+import numpy as np
+
+from crypto_analyzer import analyze_price_series
+
+
+def test_non_positive_prices_are_skipped():
+    analysis = analyze_price_series([0.0, 100.0, 110.0])
+
+    assert analysis['start_price'] == 100.0
+    assert analysis['change_percent'] == 10.0
+    assert np.isfinite(analysis['volatility'])
+    json.dumps(analysis, allow_nan=False)
+
+
+def test_series_without_usable_changes_is_insufficient():
+    assert analyze_price_series([0.0, 0.0, 5.0]) == "insufficient_data"
+    assert analyze_price_series([-1.0, 5.0]) == "insufficient_data"
+    assert analyze_price_series([[10.0, 0.0, 12.0], [10.0, 11.0, 12.0]])[0] == "insufficient_data"
@@ -0,0 +1,74 @@
+import math
+import pickle
+
+from statement_index import StatementIndex, VectorIndexSearch
+
+
+class _Statement:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FallbackSearch:
+    def __init__(self):
+        self.searched = []
+
+    def compare_statements(self, statement, other):
+        return 0.0
+
+    def search(self, input_statement, **additional_parameters):
+        self.searched.append(input_statement.text)
+        yield 'fallback result'
+
+
+def _expected_norms(index):
+    """Norms computed from scratch with the final IDFs"""
+    squares = [0.0] * len(index.docs)
+    for term, posting in index.postings.items():
+        for doc_id, weight in posting:
+            squares[doc_id] += (weight * index._idf(term)) ** 2
+    return [math.sqrt(total) for total in squares]
+
+
+def test_search_falls_back_without_candidates():
+    index = StatementIndex()
+    index.add("bitcoin is a cryptocurrency")
+    fallback = _FallbackSearch()
+    search = VectorIndexSearch(chatbot=None, index=index, fallback=fallback)
+
+    assert list(search.search(_Statement("hello there"))) == ['fallback result']
+    assert fallback.searched == ["hello there"]
+
+
+def test_rebuild_refreshes_drifted_norms():
+    index = StatementIndex()
+    for text in ("bitcoin price", "ethereum price", "staking rewards", "bitcoin mining energy"):
+        index.add(text)
+    assert not all(math.isclose(a, b) for a, b in zip(index.doc_norms, _expected_norms(index)))
+
+    index.rebuild()
+
+    assert index.added_since_rebuild == 0
+    assert all(math.isclose(a, b) for a, b in zip(index.doc_norms, _expected_norms(index)))
+
+
+def test_maybe_rebuild_waits_for_enough_growth():
+    index = StatementIndex(rebuild_ratio=0.5)
+    for number in range(10):
+        index.add(f"statement number {number}")
+    assert index.maybe_rebuild()
+
+    index.add("one more statement")
+    assert not index.maybe_rebuild()
+
+
+def test_old_pickles_get_rebuilt():
+    index = StatementIndex()
+    index.add("bitcoin price")
+    state = index.__getstate__()
+    del state['rebuild_ratio'], state['added_since_rebuild']
+
+    restored = StatementIndex.__new__(StatementIndex)
+    restored.__setstate__(pickle.loads(pickle.dumps(state)))
+
+    assert restored.maybe_rebuild()
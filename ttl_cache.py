@@ -0,0 +1,253 @@
+"""
+CryptoBud TTL Cache
+Thread-safe time-based cache with stale-while-revalidate and batched loading
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+def _report_refresh_error(error):
+    """Log a failed load nobody waited on, e.g. a stale-entry revalidation"""
+    print(f"Error refreshing cache: {error}")
+
+
+def _report_task_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        _report_refresh_error(task.exception())
+
+
+class TTLCache:
+    def __init__(self, ttl=30, stale_ttl=120, negative_ttl=30, max_size=1024, wait_timeout=15):
+        """Create a cache
+
+        Entries are fresh for ``ttl`` seconds. For a further ``stale_ttl``
+        seconds they are still served, but a background refresh is started.
+        Keys the loader has no value for are remembered as misses for
+        ``negative_ttl`` seconds. Least recently used entries are evicted
+        beyond ``max_size``.
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._inflight_tasks = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'loads': 0, 'evictions': 0}
+
+    def _state(self, key, now):
+        """Return ('fresh' | 'stale' | 'missing', value) for a key; lock must be held"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return 'missing', None
+
+        value, stored_at = entry
+        age = now - stored_at
+        if value is None:
+            return ('fresh', None) if age < self.negative_ttl else ('missing', None)
+        if age < self.ttl:
+            return 'fresh', value
+        if age < self.ttl + self.stale_ttl:
+            return 'stale', value
+        return 'missing', None
+
+    def get(self, key, loader):
+        """Return the cached value for a single key"""
+        return self.get_many([key], loader)[key]
+
+    def get_many(self, keys, loader, extra_keys=()):
+        """Return {key: value} for keys, loading every miss in one loader call
+
+        ``loader`` takes a list of keys and returns a dict of the values it
+        found. When a load is needed anyway, any ``extra_keys`` that are not
+        fresh ride along in the same call, so related keys are warmed for free.
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.monotonic()
+        results = {}
+        missing = []
+        stale = []
+
+        with self._lock:
+            for key in keys:
+                state, value = self._state(key, now)
+                if state == 'missing':
+                    missing.append(key)
+                    self.stats['misses'] += 1
+                    continue
+
+                results[key] = value
+                self._entries.move_to_end(key)
+                if state == 'stale':
+                    stale.append(key)
+                    self.stats['stale_hits'] += 1
+                else:
+                    self.stats['hits'] += 1
+
+            if missing:
+                requested = set(missing)
+                for key in extra_keys:
+                    if key not in requested and self._state(key, now)[0] != 'fresh':
+                        missing.append(key)
+                        requested.add(key)
+
+        if stale:
+            self.refresh_in_background(stale, loader)
+
+        if missing:
+            loaded = self._load(missing, loader)
+            for key in keys:
+                if key not in results:
+                    results[key] = loaded.get(key)
+
+        return results
+
+    async def get_async(self, key, loader):
+        """Async variant of get; ``loader()`` returns an awaitable of the value
+
+        Stale values are served while one task revalidates them in the
+        background, and concurrent misses for a key share a single load.
+        """
+        with self._lock:
+            state, value = self._state(key, time.monotonic())
+            if state == 'missing':
+                self.stats['misses'] += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats['hits' if state == 'fresh' else 'stale_hits'] += 1
+
+        if state == 'fresh':
+            return value
+
+        task = self._load_async(key, loader)
+        if state == 'stale':
+            return value
+        return await asyncio.shield(task)
+
+    def _load_async(self, key, loader):
+        """Start loading a key on the running loop, or join the load already in flight"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._inflight_tasks.get(key)
+            if task is None or task.get_loop() is not loop:
+                task = loop.create_task(self._store_async(key, loader))
+                task.add_done_callback(_report_task_error)
+                self._inflight_tasks[key] = task
+                self.stats['loads'] += 1
+        return task
+
+    async def _store_async(self, key, loader):
+        try:
+            value = await loader()
+            with self._lock:
+                self._store(key, value, time.monotonic())
+            return value
+        finally:
+            with self._lock:
+                if self._inflight_tasks.get(key) is asyncio.current_task():
+                    del self._inflight_tasks[key]
+
+    async def wait_async(self):
+        """Wait for the async loads in flight on the running loop, including revalidations"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = [task for task in self._inflight_tasks.values() if task.get_loop() is loop]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def refresh_in_background(self, keys, loader):
+        """Reload keys on a daemon thread, skipping any already being loaded
+
+        Returns the thread, or None when every key already has a load in flight.
+        """
+        owned, _ = self._claim(keys)
+        if not owned:
+            return None
+
+        def refresh():
+            try:
+                self._load_owned(owned, loader)
+            except Exception as e:
+                _report_refresh_error(e)
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+        return thread
+
+    def put_many(self, values):
+        """Store already-fetched values, e.g. from a prefetch job"""
+        now = time.monotonic()
+        with self._lock:
+            for key, value in values.items():
+                self._store(key, value, now)
+
+    def _store(self, key, value, now):
+        """Insert an entry and evict the least recently used; lock must be held"""
+        self._entries[key] = (value, now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _claim(self, keys):
+        """Mark keys nobody is loading as in flight; returns (owned, {key: event} to wait on)"""
+        owned = []
+        waiting = {}
+
+        with self._lock:
+            for key in keys:
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = threading.Event()
+                    owned.append(key)
+                else:
+                    waiting[key] = event
+            if owned:
+                self.stats['loads'] += 1
+        return owned, waiting
+
+    def _load_owned(self, owned, loader):
+        """Load claimed keys in one loader call, then release their waiters"""
+        results = {}
+        try:
+            loaded = loader(owned) or {}
+            now = time.monotonic()
+            with self._lock:
+                for key in owned:
+                    value = loaded.get(key)
+                    self._store(key, value, now)
+                    results[key] = value
+        finally:
+            with self._lock:
+                for key in owned:
+                    self._inflight.pop(key).set()
+        return results
+
+    def _load(self, keys, loader):
+        """Load keys, sharing in-flight loads started by other threads"""
+        owned, waiting = self._claim(keys)
+        results = self._load_owned(owned, loader) if owned else {}
+
+        if waiting:
+            for key, event in waiting.items():
+                event.wait(self.wait_timeout)
+            with self._lock:
+                for key in waiting:
+                    entry = self._entries.get(key)
+                    results[key] = entry[0] if entry else None
+
+        return results
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)